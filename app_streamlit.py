@@ -1,11 +1,18 @@
-import os
-import streamlit as st
-from dotenv import load_dotenv
-from llama_cloud_services import LlamaCloudIndex
-from llama_index.llms.openai import OpenAI
-from llama_index.core.prompts import PromptTemplate
+import time
 
-load_dotenv()
+import streamlit as st
+import catalogue
+import chatbot
+import country_risk
+import hub_digests
+import intents
+import recommendation_cache
+import recommendation_records
+import router
+import services
+import sessions
+import streaming
+import tracing
 
 # Page config
 st.set_page_config(
@@ -15,6 +22,11 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Script run timing (shown in the sidebar) and optional /metrics endpoint on MEYDAN_METRICS_PORT
+rerun_start = time.perf_counter()
+tracing.serve_from_env()
+hub_digests.get_store()  # pre-warm: loaded once per process, before the first recommendation
+
 # Custom CSS for modern look
 st.markdown("""
 <style>
@@ -59,25 +71,8 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize LlamaIndex and OpenAI - EXACTLY as in chatbot.py
-@st.cache_resource
-def initialize_services():
-    """Initialize services exactly as in chatbot.py"""
-    print("Initializing Meydan Free Zone Sales Assistant...")
-    index = LlamaCloudIndex(
-        name="business_activity_intelligence-1759747899",  # EXACT name from chatbot.py
-        project_name="Default",
-        organization_id=os.getenv("LLAMA_CLOUD_ORGANIZATION_ID"),
-        api_key=os.getenv("LLAMA_CLOUD_API_KEY"),
-    )
-    
-    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-    llm = OpenAI(model="gpt-4o", temperature=0.1)  # EXACT model from chatbot.py
-    
-    return index, llm
-
-# Initialize globally
-index, llm = initialize_services()
+# LlamaIndex and OpenAI are created lazily by services.py (same index and model as chatbot.py)
+# and shared by every Streamlit session in this process
 
 # EXACT System Prompt from chatbot.py
 SYSTEM_PROMPT = """You are an expert Meydan Free Zone business activity consultant with comprehensive knowledge of 2,267 business activities across multiple sources.
@@ -164,23 +159,47 @@ CRITICAL RULES:
 
 Be precise, strategic, and consultative. Ensure recommendations maximize customer success while adhering to regulations."""
 
+# Output format sent with every recommendation request (rules and reasoning steps live in SYSTEM_PROMPT);
+# answers are schema-constrained JSON parsed into recommendation_records.Recommendation
+RECOMMENDATION_COUNT = 2
+RECOMMENDATION_FORMAT = recommendation_records.format_instructions(
+    RECOMMENDATION_COUNT,
+    explanation="2-3 sentences explaining why this fits customer needs with persona logic applied",
+    insights="Include strategic guidance from Activity Hubs and MFZ Knowledge Base if available",
+)
+
+# (correlation, risk, approval) weights and minimum relative correlation per persona for this prompt
+PERSONA_WEIGHTS = {
+    "Business": (0.85, 0.15, 0.0),
+    "Residential": (0.50, 0.50, 0.0),
+    "Finance": (0.50, 0.50, 0.0),
+}
+MIN_RELATIVE_CORRELATION = {"Business": 0.90, "Residential": 0.80, "Finance": 0.80}
+
+# Same pipeline as chatbot.py (chatbot.stream_activity_recommendations) with this prompt's settings;
+# pre-warmed answers are for the chatbot prompt, so the warm store is not used here
+VARIANT = chatbot.RecommendationVariant(
+    "streamlit", SYSTEM_PROMPT, RECOMMENDATION_COUNT, RECOMMENDATION_FORMAT,
+    prioritization={
+        "Residential": "Apply weights: Risk (50%) + Correlation (50%)\n"
+                       "Accept 80%+ correlation match",
+        "Business": "Apply weights: Correlation (85%) + Risk (15%)\n"
+                    "STRICT REQUIREMENT: Minimum 90% correlation with business description\n"
+                    "This is a genuine entrepreneur - exact activity match is critical",
+    },
+    top_k={"Business": 10, "Residential": 8, "Finance": 8},
+    kb_top_k=1,
+    weights=PERSONA_WEIGHTS,
+    min_relative_correlation=MIN_RELATIVE_CORRELATION,
+)
+
 # Initialize session state
 if 'step' not in st.session_state:
     st.session_state.step = 'welcome'
-    st.session_state.profile = {
-        "shareholders": None,
-        "nationalities": [],
-        "visas_needed": None,
-        "business_description": None,
-        "experience": None,
-        "flexibility": None,
-        "purpose": None,
-        "timeline": None,
-        "persona": None,
-        "persona_answers": {}
-    }
+    st.session_state.profile = sessions.CustomerProfile()
     st.session_state.current_question = 0
     st.session_state.recommendations = None
+    st.session_state.recommendation_records = []
     st.session_state.chat_history = []
 
 # EXACT helper functions from chatbot.py
@@ -213,168 +232,6 @@ def concise_summary(answer, max_words=15):
         return answer
     return " ".join(words[:max_words]) + "..."
 
-def get_activity_recommendations(profile):
-    """Query index with persona-aware logic and chain-of-thought reasoning"""
-    
-    persona = profile['persona']
-    
-    # Build comprehensive query
-    query_context = f"""
-CUSTOMER PROFILE ANALYSIS:
-
-Persona Type: {persona}
-Number of Shareholders: {profile['shareholders']}
-Nationalities: {profile['nationalities']}
-Visas Needed: {profile['visas_needed']}
-Business Description: {profile['business_description']}
-Experience Level: {profile['experience']}
-Business Flexibility: {profile['flexibility']}
-Primary Purpose: {profile['purpose']}
-Timeline: {profile['timeline']}
-
-"""
-    
-    # Add persona-specific context
-    if persona == "Residential":
-        query_context += f"""
-RESIDENTIAL PERSONA CONTEXT:
-- Dependents: {profile['persona_answers'].get('dependents', 'N/A')}
-- Residency Plan: {profile['persona_answers'].get('residency_plan', 'N/A')}
-
-PRIORITIZATION FOR THIS PERSONA:
-Apply weights: Risk (50%) + Correlation (50%)
-Accept 80%+ correlation match
-"""
-    elif persona == "Business":
-        query_context += f"""
-BUSINESS PERSONA CONTEXT:
-- Detailed Business Model: {profile['persona_answers'].get('business_model', 'N/A')}
-
-PRIORITIZATION FOR THIS PERSONA:
-Apply weights: Correlation (85%) + Risk (15%)
-STRICT REQUIREMENT: Minimum 90% correlation with business description
-This is a genuine entrepreneur - exact activity match is critical
-"""
-    elif persona == "Finance":
-        query_context += f"""
-FINANCE PERSONA CONTEXT:
-- Invoicing Method: {profile['persona_answers'].get('invoicing', 'N/A')}
-- Bank Account Purpose: {profile['persona_answers'].get('bank_purpose', 'N/A')}
-- Tax Strategy: {profile['persona_answers'].get('tax_strategy', 'N/A')}
-
-CRITICAL: Check Country Risk Rating first for nationalities: {profile['nationalities']}
-IF any nationality has "Override" rating → Stop and respond "Cannot issue license"
-IF acceptable ratings → Calculate bank account opening probability using nationality + activity risk matrix
-Apply standard prioritization after country risk check passes
-"""
-    
-    query_context += """
-
-CHAIN-OF-THOUGHT ANALYSIS REQUIRED:
-1. Analyze the business description and identify core activities
-2. Search Activity Hubs for popular activity matches (e-commerce, general trading, consultancy, IT, advertising, etc.)
-3. Search Business Activities Database for all possible matches using keywords and synonyms
-4. Apply persona-specific prioritization weights
-5. For each candidate activity, evaluate:
-   - Semantic correlation strength (90%+ for Business, 80%+ for Residential/Finance)
-   - Risk rating (Low preferred, High only when necessary)
-   - Group optimization (fewer groups better)
-6. Consider strategic insights from MFZ Knowledge Base (avoid general trading, flag concerns, suggest specific alternatives)
-7. Consider complementary activities within 3-group package
-8. Assess banking implications (especially for Finance persona)
-
-DELIVERABLE:
-Provide preferably 2 ranked activity recommendations following the format:
-
-RECOMMENDATION 1: [Primary Recommendation]
-Group: [3-digit code]
-Activity Code: [6-digit format like 1811.04]
-Activity Name: [Full name]
-Category: [e.g., Manufacturing, Trading, Professional]
-Full Description: [Full description from database]
-Third Party Approval: [Yes/No] [Authority name if yes, e.g., "Dubai Municipality (DM)"]
-When: [PRE/POST/N/A]
-Risk Rating: [Low/Medium/High]
-Industry Risk: [Yes/No/N/A]
-Match Explanation: [2-3 sentences explaining why this fits customer needs with persona logic applied]
-Related Activities:
-  - [Code]: [Name] - [1-line description]
-  - [Code]: [Name] - [1-line description]
-Expert Insights: [Include strategic guidance from Activity Hubs and MFZ Knowledge Base if available]
-
-RECOMMENDATION 2: [Secondary Recommendation]
-Group: [3-digit code]
-Activity Code: [6-digit format like 1811.04]
-Activity Name: [Full name]
-Category: [e.g., Manufacturing, Trading, Professional]
-Full Description: [Full description from database]
-Third Party Approval: [Yes/No] [Authority name if yes, e.g., "Dubai Municipality (DM)"]
-When: [PRE/POST/N/A]
-Risk Rating: [Low/Medium/High]
-Industry Risk: [Yes/No/N/A]
-Match Explanation: [2-3 sentences explaining why this fits customer needs with persona logic applied]
-Related Activities:
-  - [Code]: [Name] - [1-line description]
-  - [Code]: [Name] - [1-line description]
-Expert Insights: [Include strategic guidance from Activity Hubs and MFZ Knowledge Base if available]
-
-CRITICAL RULES:
-1. For Business persona: Never compromise on correlation - must be 90%+ match
-2. For Residential persona: Prefer N/A approvals and Low risk even if correlation is 80%+
-3. For Finance persona: Check nationality risk first - if Override, immediately respond "Cannot issue license due to country risk rating"
-4. Always suggest fewer activity groups when possible
-5. Flag general trading concerns, even other concerns and suggest specific alternatives (MFZ Business Activities Knowledge Base)
-6. Explain any approval delays or banking complications transparently
-
-Be precise, strategic, and consultative. Ensure recommendations maximize customer success while adhering to regulations.
-"""
-    
-    # Retrieve with appropriate top_k based on persona
-    top_k = 10 if persona == "Business" else 8
-    
-    retriever = index.as_retriever(similarity_top_k=top_k)
-    query_engine = index.as_query_engine(llm=llm, similarity_top_k=top_k)
-    
-    print("\n[Applying chain-of-thought reasoning across all knowledge sources...]")
-    
-    response = query_engine.query(query_context)
-    return response.response
-    
-    
-    
-
-def update_field(profile, field_update):
-    """Update customer profile field based on conversational input - EXACT from chatbot.py"""
-    field_lower = field_update.lower()
-    
-    if "shareholder" in field_lower:
-        words = field_update.split()
-        for word in words:
-            if word.isdigit():
-                profile['shareholders'] = word
-                return True
-    
-    elif "visa" in field_lower:
-        words = field_update.split()
-        for word in words:
-            if word.isdigit():
-                profile['visas_needed'] = word
-                return True
-    
-    elif "business" in field_lower or "activity" in field_lower:
-        profile['business_description'] = field_update
-        return True
-    
-    elif "nationality" in field_lower or "passport" in field_lower:
-        profile['nationalities'] = field_update
-        return True
-    
-    elif "timeline" in field_lower:
-        profile['timeline'] = field_update
-        return True
-    
-    return False
-
 # Main App
 st.markdown('<div class="main-header">🏢 Meydan Free Zone Sales Assistant</div>', unsafe_allow_html=True)
 
@@ -504,17 +361,21 @@ elif st.session_state.step == 'persona_questions':
 elif st.session_state.step == 'loading':
     st.markdown('<div class="section-header">🔄 Generating Recommendations</div>', unsafe_allow_html=True)
     
-    with st.spinner("Analyzing customer requirements across all knowledge sources..."):
-        try:
-            recommendations = get_activity_recommendations(st.session_state.profile)
-            st.session_state.recommendations = recommendations
-            st.session_state.step = 'results'
+    st.write("Analyzing customer requirements across all knowledge sources...")
+    try:
+        # Tokens are shown as they are generated; the final (catalogue-corrected) text is kept
+        stream = chatbot.stream_activity_recommendations(st.session_state.profile, VARIANT)
+        st.write_stream(stream)
+        st.session_state.recommendations = stream.text
+        st.session_state.recommendation_records = stream.records
+        st.session_state.last_timing = stream.timing_report()
+        st.session_state.step = 'results'
+        st.rerun()
+    except Exception as e:
+        st.error(f"Error generating recommendations: {str(e)}")
+        if st.button("Try Again"):
+            st.session_state.step = 'persona_questions'
             st.rerun()
-        except Exception as e:
-            st.error(f"Error generating recommendations: {str(e)}")
-            if st.button("Try Again"):
-                st.session_state.step = 'persona_questions'
-                st.rerun()
 
 # Results Step
 elif st.session_state.step == 'results':
@@ -561,11 +422,45 @@ elif st.session_state.step == 'results':
                 st.write(f"**Invoicing:** {st.session_state.profile['persona_answers'].get('invoicing', 'N/A')}")
                 st.write(f"**Bank Purpose:** {st.session_state.profile['persona_answers'].get('bank_purpose', 'N/A')}")
                 st.write(f"**Tax Strategy:** {st.session_state.profile['persona_answers'].get('tax_strategy', 'N/A')}")
+                
+                # Bank account success probability for each recommended activity x shareholder nationality
+                import scoring
+                table = scoring.bank_probability_table(
+                    catalogue.find_activities(st.session_state.recommendations),
+                    country_risk.resolve_nationalities(st.session_state.profile['nationalities'])[0]
+                )
+                if table:
+                    st.write("**Bank Account Success Probability:**")
+                    st.dataframe(
+                        [{"Activity": f"{activity.code} {activity.name}",
+                          **{country: f"{p:.0%}" for country, p in row.items()}} for activity, row in table],
+                        use_container_width=True, hide_index=True
+                    )
     
     # Display Recommendations
     st.markdown('<div class="section-header">🎯 Business Activity Recommendations</div>', unsafe_allow_html=True)
     
-    st.markdown(f"```\n{st.session_state.recommendations}\n```")
+    records = st.session_state.get('recommendation_records')
+    if records:
+        for record in records:
+            with st.container(border=True):
+                st.markdown(f"#### {record.rank}. {record.name} `{record.code}`")
+                cols = st.columns(4)
+                cols[0].metric("Group", record.group or "N/A")
+                cols[1].metric("Risk Rating", record.risk_rating or "N/A")
+                cols[2].metric("Third Party", record.third_party or "N/A")
+                cols[3].metric("When", record.when or "N/A")
+                st.write(f"**Category:** {record.category}  |  **Industry Risk:** {record.industry_risk}")
+                st.write(record.description)
+                st.write(f"**Why it fits:** {record.match_explanation}")
+                if record.related:
+                    st.write("**Related Activities:**")
+                    for related in record.related:
+                        st.write(f"- `{related['code']}` {related['name']} - {related['description']}")
+                if record.expert_insights:
+                    st.info(record.expert_insights)
+    else:
+        st.markdown(f"```\n{st.session_state.recommendations}\n```")
     
     # Chat Interface
     st.markdown('<div class="section-header">💬 Ask Follow-up Questions</div>', unsafe_allow_html=True)
@@ -582,12 +477,16 @@ elif st.session_state.step == 'results':
         # Add user message to chat
         st.session_state.chat_history.append({"role": "user", "content": user_input})
         
-        # Check if it's a refresh request
-        if user_input.lower() == 'refresh':
-            with st.spinner("Regenerating recommendations..."):
+        # Refresh, profile update or question - classified and applied exactly as in chatbot.py
+        intent = intents.classify(user_input)
+        if intent.kind == "refresh":
+            with st.chat_message("assistant"):
                 try:
-                    recommendations = get_activity_recommendations(st.session_state.profile)
-                    st.session_state.recommendations = recommendations
+                    stream = chatbot.stream_activity_recommendations(st.session_state.profile, VARIANT)
+                    st.write_stream(stream)
+                    st.session_state.recommendations = stream.text
+                    st.session_state.recommendation_records = stream.records
+                    st.session_state.last_timing = stream.timing_report()
                     st.session_state.chat_history.append({
                         "role": "assistant", 
                         "content": "✅ Recommendations updated! Scroll up to see the new results."
@@ -599,7 +498,7 @@ elif st.session_state.step == 'results':
                     })
         else:
             # Check if it's a field update
-            is_update = update_field(st.session_state.profile, user_input)
+            is_update = chatbot.apply_intent(st.session_state.profile, intent)
             
             if is_update:
                 st.session_state.chat_history.append({
@@ -607,11 +506,9 @@ elif st.session_state.step == 'results':
                     "content": "✅ Profile updated! Type 'refresh' to see updated recommendations."
                 })
             else:
-                # Generate response using EXACT logic from chatbot.py
-                with st.spinner("Thinking..."):
+                # Generate response using EXACT logic from chatbot.py, streamed token by token
+                with st.chat_message("assistant"):
                     try:
-                        query_engine = index.as_query_engine(llm=llm, similarity_top_k=5)
-                        
                         context = f"""
 Customer context: 
 - Persona: {st.session_state.profile['persona']}
@@ -623,10 +520,12 @@ Question: {user_input}
 Provide a clear, helpful answer based on the knowledge sources (Business Activities, Activity Hubs, MFZ Knowledge Base).
 Use Mike's sales expertise for strategic guidance. Be consultative and honest.
 """
-                        response = query_engine.query(context)
+                        stream = streaming.TimedStream(router.query_tokens(user_input, context), label="Answer")
+                        st.write_stream(stream)
+                        st.session_state.last_timing = stream.timing_report()
                         st.session_state.chat_history.append({
                             "role": "assistant",
-                            "content": response.response
+                            "content": stream.text
                         })
                     except Exception as e:
                         st.session_state.chat_history.append({
@@ -684,4 +583,44 @@ with st.sidebar:
     st.write("Meydan Free Zone Sales Assistant helps identify optimal business activities for customers.")
     st.write("**Knowledge Base:** 2,267+ activities")
     st.write("**Model:** GPT-4o")
-    st.write("**Index:** business_activity_intelligence")
\ No newline at end of file
+    st.write("**Index:** business_activity_intelligence")
+    
+    if st.session_state.get('last_timing'):
+        st.write(f"**Last response:** {st.session_state.last_timing.strip('[]')}")
+    
+    registry = services.registry_stats()
+    st.write(f"**Engines:** {registry['built']} built in {registry['build_seconds'] * 1000:.0f} ms, "
+             f"reused {registry['reused']} times")
+    
+    import http_pool
+    pool = http_pool.pool_stats()
+    st.write(f"**HTTP pool:** {pool['requests']} requests, peak {pool['peak_in_flight']} in flight "
+             f"(limit {pool['limits']['max_connections']})")
+    
+    cache_stats = recommendation_cache.get_cache().stats()
+    st.write(f"**Recommendation cache:** {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+             f"({cache_stats['size']} cached)")
+    
+    st.markdown("---")
+    st.markdown("### ⏱️ Tracing")
+    for kind in ("recommendation", "chat"):
+        trace = tracing.last_trace(kind)
+        if trace is not None:
+            st.write(f"**Last {kind}:** {trace.total:.2f}s ({trace.status})")
+            st.dataframe([{"Stage": stage, "ms": round(seconds * 1000, 1)} for stage, _, seconds, _ in trace.spans],
+                         use_container_width=True, hide_index=True)
+    totals = tracing.metrics.totals()
+    st.write(f"**LLM usage:** {totals['prompt_tokens']:,} prompt / {totals['completion_tokens']:,} completion "
+             f"tokens, ~${totals['cost_usd']:.4f}")
+    routes = router.stats()
+    if routes:
+        st.dataframe([{"Route": r["route"], "Model": r["model"], "Requests": r["requests"],
+                       "Mean s": round(r["mean_seconds"], 2), "Cost $": round(r["cost_usd"], 4)}
+                      for r in routes.values()],
+                     use_container_width=True, hide_index=True)
+    if st.session_state.get('last_rerun'):
+        st.write(f"**Previous page render:** {st.session_state.last_rerun * 1000:.0f} ms")
+
+# Streamlit render time for this script run
+st.session_state.last_rerun = time.perf_counter() - rerun_start
+tracing.metrics.observe_stage("streamlit", "rerun", st.session_state.last_rerun)
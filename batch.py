@@ -0,0 +1,218 @@
+import argparse
+import csv
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import chatbot
+import recommendation_cache
+
+# Batch recommendations for exported leads: reads profiles from CSV or JSONL, runs
+# get_activity_recommendations with bounded concurrency under a requests-per-minute limit,
+# retries rate-limited calls with backoff and appends one JSON line per lead as it finishes.
+# Leads already in the output file are skipped, so an interrupted run resumes where it stopped.
+#
+#   python batch.py leads.csv --output results.jsonl --workers 4 --rpm 60
+#
+# Lead columns: the chatbot.profile_keys fields (shareholders, visas_needed, business_description,
+# experience, flexibility, purpose, timeline), persona (a/b/c or name), the persona answer keys
+# (dependents, residency_plan, business_model, invoicing, bank_purpose, tax_strategy) and an
+# optional id.
+
+WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+REQUESTS_PER_MINUTE = float(os.getenv("BATCH_RPM", "60"))
+MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "5"))
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per minute, bursts up to `burst`"""
+
+    def __init__(self, rate=REQUESTS_PER_MINUTE, burst=1, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 60.0 / rate if rate > 0 else 0.0
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        if not self.interval:
+            return
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) / self.interval)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) * self.interval
+            self.sleep(wait_for)
+
+
+def is_rate_limited(error):
+    """True for HTTP 429 / rate-limit errors from OpenAI or LlamaCloud"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    if getattr(getattr(error, "response", None), "status_code", None) == 429:
+        return True
+    return type(error).__name__ == "RateLimitError" or "rate limit" in str(error).lower()
+
+
+def read_leads(path):
+    """Yield lead dicts from a .csv or .jsonl file, one at a time"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def lead_id(lead):
+    """Explicit id column, or a hash of the lead's normalized fields"""
+    if lead.get("id"):
+        return str(lead["id"])
+    return recommendation_cache.profile_key({k: v for k, v in lead.items() if v}, variant="lead")[:16]
+
+
+def build_profile(lead):
+    """Customer profile from a lead, answered the same way as run_chatbot"""
+    profile = chatbot.new_profile()
+    for i, key in enumerate(chatbot.profile_keys):
+        chatbot.record_initial_answer(profile, i, str(lead.get(key) or "").strip())
+
+    persona = chatbot.select_persona(str(lead.get("persona") or ""))
+    if persona is None:
+        raise ValueError(f"Unknown persona: {lead.get('persona')!r} (expected a, b, c or a persona name)")
+    profile['persona'] = persona
+    for i, (key, _) in enumerate(chatbot.persona_answer_keys[persona]):
+        answer = str(lead.get(key) or "").strip()
+        if answer:
+            chatbot.record_persona_answer(profile, i, answer)
+    return profile
+
+
+def completed_ids(path):
+    """Ids of leads already processed in a previous run (recommended or blocked by country risk)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # partial last line from a crash
+            if record.get("status") in ("ok", "blocked"):
+                done.add(record["id"])
+    return done
+
+
+class ResultWriter:
+    """Appends one JSON line per result and flushes it to disk immediately"""
+
+    def __init__(self, path):
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def recommendation_dicts(profile):
+    """Recommendations for one profile as JSON-ready dicts"""
+    return [record.to_dict() for record in chatbot.get_activity_recommendations(profile)]
+
+
+def process(lead, limiter, max_retries=MAX_RETRIES, recommend=None):
+    """Recommendations for one lead as an output record, retrying rate-limited calls"""
+    recommend = recommend or recommendation_dicts
+    record = {"id": lead_id(lead)}
+    start = time.perf_counter()
+    try:
+        profile = build_profile(lead)
+        record["persona"] = profile['persona']
+        for attempt in range(max_retries + 1):
+            limiter.acquire()
+            try:
+                record["recommendations"] = recommend(profile)
+                break
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == max_retries:
+                    raise
+                record["retries"] = attempt + 1
+                time.sleep(min(60.0, 2 ** attempt) + random.uniform(0, 1))
+        record["status"] = "ok"
+    except chatbot.LicenseBlocked as e:
+        record["status"] = "blocked"
+        record["reason"] = str(e)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.perf_counter() - start, 2)
+    return record
+
+
+def run(input_path, output_path, workers=WORKERS, rpm=REQUESTS_PER_MINUTE, max_retries=MAX_RETRIES, recommend=None):
+    """Process every lead not already in output_path; returns {"ok", "blocked", "error", "skipped"} counts"""
+    done = completed_ids(output_path)
+    limiter = RateLimiter(rpm, burst=workers)
+    writer = ResultWriter(output_path)
+    counts = {"ok": 0, "blocked": 0, "error": 0, "skipped": 0}
+    pending = set()
+
+    def collect(futures):
+        for future in futures:
+            record = future.result()
+            writer.write(record)
+            counts[record["status"]] += 1
+            print(f"[{record['status'].upper()}] {record['id']} ({record['seconds']}s)")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for lead in read_leads(input_path):
+                if lead_id(lead) in done:
+                    counts["skipped"] += 1
+                    continue
+                # Keep at most 2x workers leads in memory so large files stream through
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending.add(pool.submit(process, lead, limiter, max_retries, recommend))
+            collect(wait(pending).done)
+    finally:
+        writer.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate activity recommendations for a CSV/JSONL lead file")
+    parser.add_argument("input", help="Lead file (.csv or .jsonl)")
+    parser.add_argument("--output", default=None, help="Results file (default: <input>.results.jsonl)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent recommendations")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="Max recommendation requests per minute (0 = unlimited)")
+    parser.add_argument("--max-retries", type=int, default=MAX_RETRIES, help="Retries per lead on rate-limit errors")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    start = time.perf_counter()
+    counts = run(args.input, output, workers=args.workers, rpm=args.rpm, max_retries=args.max_retries)
+    print(f"\n[Batch complete in {time.perf_counter() - start:.1f}s: {counts['ok']} ok, {counts['blocked']} blocked, "
+          f"{counts['error']} errors, {counts['skipped']} already done] -> {output}")
+
+
+if __name__ == "__main__":
+    main()
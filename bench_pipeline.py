@@ -0,0 +1,194 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import bench_startup
+from bench_retrieval import percentile
+
+# End-to-end latency benchmark for the recommendation pipeline, stage by stage, over a fixed
+# profile per persona. Each run goes through chatbot.stream_activity_recommendations with every
+# cache emptied, and stage times are read from its tracing spans. Runs offline on the replay
+# backend by default (see fakes.py); use --backend live to measure against LlamaCloud and OpenAI.
+#
+#   python bench_pipeline.py --iterations 20 --save-baseline baseline.json
+#   python bench_pipeline.py --iterations 20 --baseline baseline.json   # exits 1 on regression
+
+PROFILES = {
+    "Residential": {
+        "initial": ["1 British", "3", "IT consultancy for small businesses", "new venture",
+                    "yes open to other activities", "residency visa for my family", "within 1 month"],
+        "persona": ["wife and two children", "reside in UAE"],
+    },
+    "Business": {
+        "initial": ["2 Indian", "4", "e-commerce online store selling clothes", "branch of existing company",
+                    "stick to my plan", "expand business to the Middle East", "3 months"],
+        "persona": ["online store with own website, stock held in a 3PL warehouse in Dubai"],
+    },
+    "Finance": {
+        "initial": ["1 German", "1", "management consultancy", "new", "flexible",
+                    "open a bank account and tax benefits", "as soon as possible"],
+        "persona": ["invoice EU clients by bank transfer", "yes, to receive global payments",
+                    "0% corporate tax on qualifying income"],
+    },
+}
+
+# Spans recorded by chatbot.stream_activity_recommendations, plus rendering and the whole run.
+# first_token is the time from the LLM request to the first complete recommendation; llm
+# includes output_parse (incremental JSON parsing and validation).
+STAGES = ["country_check", "cache_lookup", "local_context", "retrieval", "prompt_build", "first_token", "llm",
+          "output_parse", "table_render", "total"]
+
+
+def build_profile(persona):
+    """Fixed benchmark profile, answered the same way as run_chatbot"""
+    import chatbot
+    answers = PROFILES[persona]
+    profile = chatbot.new_profile()
+    for i, answer in enumerate(answers["initial"]):
+        chatbot.record_initial_answer(profile, i, answer)
+    profile['persona'] = persona
+    for i, answer in enumerate(answers["persona"]):
+        chatbot.record_persona_answer(profile, i, answer)
+    return profile
+
+
+def bypass_caches():
+    """Point the persistent caches at a scratch directory so benchmark runs neither read nor fill them"""
+    import tempfile
+    scratch = tempfile.mkdtemp(prefix="meydan-bench-")
+    os.environ["RETRIEVAL_CACHE_PATH"] = os.path.join(scratch, "retrieval.sqlite3")
+    os.environ["RECOMMENDATION_WARM_PATH"] = os.path.join(scratch, "warm.sqlite3")
+
+
+def clear_caches():
+    """Empty every cache the recommendation pipeline reads, so each run does the full work"""
+    import recommendation_cache
+    import retrieval_cache
+    import stage_cache
+    recommendation_cache.get_cache().invalidate()
+    stage_cache.get_cache().invalidate()
+    retrieval_cache.get_cache().purge()
+
+
+def run_pipeline(profile):
+    """One uncached run of chatbot.stream_activity_recommendations; returns {stage: seconds} from its trace"""
+    import chatbot
+    import tracing
+
+    clear_caches()
+    start = time.perf_counter()
+    stream = chatbot.stream_activity_recommendations(profile)
+    stream.consume()
+    trace = tracing.last_trace("recommendation")
+    if trace is None or trace.status != "ok":
+        raise RuntimeError(f"benchmark run was not a full pipeline run (status: {getattr(trace, 'status', None)})")
+    timings = {stage: seconds for stage, _, seconds, _ in trace.spans}
+
+    render_start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        chatbot.print_summary_tables(profile, stream.text)
+    timings["table_render"] = time.perf_counter() - render_start
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def summarize(samples):
+    """p50 / p95 / p99 / mean in milliseconds"""
+    ms = [s * 1000 for s in samples]
+    return {
+        "p50": percentile(ms, 50),
+        "p95": percentile(ms, 95),
+        "p99": percentile(ms, 99),
+        "mean": statistics.mean(ms),
+        "n": len(ms),
+    }
+
+
+def run_benchmark(iterations, warmup=1, cold_start_runs=5):
+    """Stage statistics per persona, plus cold start"""
+    results = {}
+    walls = [bench_startup.run_once()[0] for _ in range(cold_start_runs)]
+    results["cold_start"] = {"import": summarize(walls)}
+
+    for persona in PROFILES:
+        profile = build_profile(persona)
+        for _ in range(warmup):
+            run_pipeline(profile)
+        samples = {stage: [] for stage in STAGES}
+        for _ in range(iterations):
+            for stage, seconds in run_pipeline(profile).items():
+                samples.setdefault(stage, []).append(seconds)
+        results[persona] = {stage: summarize(values) for stage, values in samples.items() if values}
+    return results
+
+
+def print_report(results):
+    print(f"\n{'Persona':<14} {'Stage':<14} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'mean ms':>10}")
+    print("─" * 72)
+    for group, stages in results.items():
+        for stage, s in stages.items():
+            print(f"{group:<14} {stage:<14} {s['p50']:>10.2f} {s['p95']:>10.2f} {s['p99']:>10.2f} {s['mean']:>10.2f}")
+
+
+def compare(results, baseline, tolerance, floor_ms):
+    """Stages whose p95 is more than `tolerance` (fraction) and floor_ms above the baseline"""
+    regressions = []
+    for group, stages in results.items():
+        for stage, s in stages.items():
+            before = baseline.get(group, {}).get(stage)
+            if before is None:
+                continue
+            limit = max(before["p95"] * (1 + tolerance), before["p95"] + floor_ms)
+            if s["p95"] > limit:
+                regressions.append((group, stage, before["p95"], s["p95"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline stage by stage")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--cold-start-runs", type=int, default=5)
+    parser.add_argument("--backend", choices=["replay", "live"], default="replay")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write results as a baseline JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a baseline and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.20, help="Allowed p95 slowdown (0.20 = 20%%)")
+    parser.add_argument("--floor-ms", type=float, default=2.0, help="Ignore p95 changes smaller than this")
+    args = parser.parse_args()
+
+    os.environ["MEYDAN_BACKEND"] = args.backend
+    bypass_caches()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = run_benchmark(args.iterations, args.warmup, args.cold_start_runs)
+    print(f"[Backend: {args.backend}, {args.iterations} iterations per persona]")
+    print_report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "backend": args.backend,
+                         "iterations": args.iterations, "python": platform.python_version()},
+                "results": results,
+            }, f, indent=2)
+        print(f"\n[Baseline saved to {args.save_baseline}]")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.floor_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} stage(s) slower than baseline (p95, tolerance {args.tolerance:.0%}):")
+            for group, stage, before, after in regressions:
+                print(f"   {group} / {stage}: {before:.2f} ms -> {after:.2f} ms")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
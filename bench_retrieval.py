@@ -0,0 +1,81 @@
+import argparse
+import random
+import statistics
+import time
+
+import bm25
+from catalogue import Activity, Catalogue, get_catalogue
+
+# Latency benchmark for the local BM25 retriever (build time + per-query percentiles).
+# Falls back to a synthetic 2,267-row catalogue when the real export is not present.
+
+QUERIES = [
+    "printing",
+    "general trading",
+    "e-commerce online store selling clothes",
+    "IT consultancy and software development",
+    "advertising and digital marketing agency",
+    "holding company for investments",
+    "management consultancy",
+    "import and export of food products",
+]
+
+VOCABULARY = (
+    "printing trading general ecommerce e-commerce consultancy software advertising marketing holding "
+    "investment food import export clothes textiles jewellery gold logistics shipping events media "
+    "design interior cosmetics perfumes electronics furniture machinery real estate education training"
+).split()
+
+
+def synthetic_catalogue(size=2267, seed=7):
+    """Random catalogue with realistic field lengths for timing only"""
+    rng = random.Random(seed)
+    activities = []
+    for i in range(size):
+        activities.append(Activity(
+            code=f"{1000 + i // 100}.{i % 100:02d}",
+            name=" ".join(rng.choices(VOCABULARY, k=3)),
+            group=str(100 + i // 20),
+            description=" ".join(rng.choices(VOCABULARY, k=30)),
+            keywords=", ".join(rng.choices(VOCABULARY, k=6)),
+            risk_rating=rng.choice(["Low", "Medium", "High"]),
+        ))
+    return Catalogue(activities)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local BM25 activity retriever")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    catalogue = get_catalogue()
+    if not len(catalogue):
+        print("[Using synthetic catalogue of 2,267 activities]")
+        catalogue = synthetic_catalogue()
+
+    start = time.perf_counter()
+    retriever = bm25.BM25Retriever(catalogue)
+    build = time.perf_counter() - start
+
+    timings = []
+    for i in range(args.iterations):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        retriever.retrieve(query, top_k=args.top_k)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print(f"Activities indexed: {len(catalogue)}  terms: {len(retriever.postings)}")
+    print(f"Index build:        {build * 1000:.1f} ms")
+    print(f"Query latency (ms): p50 {percentile(timings, 50):.3f}  p95 {percentile(timings, 95):.3f}  "
+          f"p99 {percentile(timings, 99):.3f}  mean {statistics.mean(timings):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Cold-start benchmark: import chatbot.py in a fresh interpreter and time it.
+# Also checks that importing the helpers does not pull in any third-party package.
+
+THIRD_PARTY_PREFIXES = ("numpy", "llama_index", "llama_cloud", "llama_cloud_services", "openai", "dotenv", "httpx", "streamlit")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import chatbot
+from chatbot import interpret_experience, get_activity_recommendations
+elapsed = time.perf_counter() - start
+loaded = sorted({m.split('.')[0] for m in sys.modules if m.split('.')[0] in %r})
+print(__import__('json').dumps({"import_seconds": elapsed, "third_party": loaded}))
+""" % (THIRD_PARTY_PREFIXES,)
+
+
+def run_once():
+    """Start a fresh interpreter, import chatbot, return (wall seconds, probe result)"""
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True).stdout
+    wall = time.perf_counter() - start
+    return wall, json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of chatbot.py")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=1.0, help="Max allowed median wall time (seconds)")
+    args = parser.parse_args()
+
+    walls, imports, third_party = [], [], set()
+    for _ in range(args.runs):
+        wall, result = run_once()
+        walls.append(wall)
+        imports.append(result["import_seconds"])
+        third_party.update(result["third_party"])
+
+    print(f"Process start + import (wall): median {statistics.median(walls)*1000:.1f} ms, max {max(walls)*1000:.1f} ms")
+    print(f"import chatbot only:           median {statistics.median(imports)*1000:.2f} ms, max {max(imports)*1000:.2f} ms")
+
+    ok = True
+    if third_party:
+        print(f"❌ Third-party packages imported at load time: {', '.join(sorted(third_party))}")
+        ok = False
+    if statistics.median(walls) > args.budget:
+        print(f"❌ Median cold start exceeds budget of {args.budget:.2f}s")
+        ok = False
+    if ok:
+        print("✅ Cold start within budget")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import math
+import re
+import threading
+
+from catalogue import get_catalogue
+
+# Offline BM25 retriever over the local activity catalogue (name, description, keywords).
+# Exact trade terms like "printing" or "general trading" are matched without any network call.
+
+K1 = 1.5
+B = 0.75
+
+# Repeat field tokens to weight them (keywords are curated trade terms, so they count most)
+FIELD_WEIGHTS = {"name": 2, "keywords": 3, "description": 1}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "for", "from", "i", "in", "is", "it",
+    "of", "on", "or", "our", "the", "to", "want", "we", "with", "my", "company", "business", "dubai", "uae",
+}
+
+_WORD = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Lower-case terms plus adjacent-word bigrams; 'e-commerce' also yields 'ecommerce'"""
+    words = []
+    for word in _WORD.findall(text.lower()):
+        if "-" in word:
+            words.extend(part for part in word.split("-") if part not in STOPWORDS)
+            word = word.replace("-", "")
+        if word not in STOPWORDS:
+            words.append(word)
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+
+class BM25Retriever:
+    """Inverted-index BM25 over catalogue activities"""
+
+    def __init__(self, catalogue):
+        self.activities = catalogue.activities
+        self.postings = {}  # term -> {doc index: term frequency}
+        self.doc_lengths = []
+
+        for doc_id, activity in enumerate(self.activities):
+            terms = []
+            for field, weight in FIELD_WEIGHTS.items():
+                terms.extend(tokenize(getattr(activity, field)) * weight)
+            self.doc_lengths.append(len(terms))
+            for term in terms:
+                postings = self.postings.setdefault(term, {})
+                postings[doc_id] = postings.get(doc_id, 0) + 1
+
+        n = len(self.activities)
+        self.avg_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def retrieve(self, query, top_k=10):
+        """Return up to top_k (Activity, score) pairs, best first"""
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in postings.items():
+                norm = K1 * (1 - B + B * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.activities[doc_id], score) for doc_id, score in best]
+
+
+_retriever = None
+_lock = threading.Lock()
+
+
+def get_retriever():
+    """Return the process-wide BM25 retriever, building it on first call"""
+    global _retriever
+    if _retriever is None:
+        with _lock:
+            if _retriever is None:
+                _retriever = BM25Retriever(get_catalogue())
+    return _retriever
+
+
+def format_matches(matches):
+    """Render BM25 matches as compact prompt lines"""
+    lines = []
+    for activity, score in matches:
+        approval = activity.third_party if activity.needs_approval else "N/A"
+        lines.append(
+            f"- {activity.code} | {activity.name} | Group {activity.group} | Risk {activity.risk_rating} "
+            f"| Third Party {approval} | When {activity.when or 'N/A'} | BM25 {score:.2f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,179 @@
+import csv
+import os
+import re
+import threading
+
+# Local copy of the Business Activities Database (2,267 activities), loaded once per process.
+# Export the database sheet to CSV at data/business_activities.csv (or set ACTIVITY_CATALOGUE_PATH).
+
+CATALOGUE_PATH = os.getenv(
+    "ACTIVITY_CATALOGUE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "business_activities.csv"),
+)
+
+# CSV header (lower-cased) -> Activity attribute
+COLUMNS = {
+    "activity code": "code",
+    "code": "code",
+    "activity name": "name",
+    "name": "name",
+    "category": "category",
+    "group": "group",
+    "description": "description",
+    "activity description": "description",
+    "third party": "third_party",
+    "third party approval": "third_party",
+    "when": "when",
+    "risk rating": "risk_rating",
+    "risk": "risk_rating",
+    "industry risk": "industry_risk",
+    "keywords": "keywords",
+    "related activities": "related",
+}
+
+
+class Activity:
+    """One row of the Business Activities Database"""
+    __slots__ = ("code", "name", "category", "group", "description", "third_party",
+                 "when", "risk_rating", "industry_risk", "keywords", "related")
+
+    def __init__(self, code, name="", category="", group="", description="", third_party="",
+                 when="", risk_rating="", industry_risk="", keywords="", related=""):
+        self.code = code
+        self.name = name
+        self.category = category
+        self.group = group
+        self.description = description
+        self.third_party = third_party
+        self.when = when
+        self.risk_rating = risk_rating
+        self.industry_risk = industry_risk
+        self.keywords = keywords
+        self.related = related
+
+    @property
+    def needs_approval(self):
+        """True when a third-party authority must approve the activity"""
+        value = self.third_party.strip().lower()
+        return bool(value) and value not in ("n/a", "na", "no", "none", "-")
+
+    def __repr__(self):
+        return f"Activity({self.code!r}, {self.name!r})"
+
+
+class Catalogue:
+    """In-memory activity catalogue with O(1) lookup by code and by group"""
+
+    def __init__(self, activities=()):
+        self.activities = list(activities)
+        self.by_code = {}
+        self.by_group = {}
+        for activity in self.activities:
+            self.by_code[normalize_code(activity.code)] = activity
+            self.by_group.setdefault(activity.group.strip(), []).append(activity)
+
+    def __len__(self):
+        return len(self.activities)
+
+    def get(self, code):
+        """Return the Activity for a code like '1811.04', or None"""
+        return self.by_code.get(normalize_code(code))
+
+    def group(self, group):
+        """Return all activities in a 3-digit group"""
+        return self.by_group.get(str(group).strip(), [])
+
+
+def normalize_code(code):
+    """Canonical form of an activity code (trimmed, no spaces)"""
+    return str(code).strip().replace(" ", "")
+
+
+def load_catalogue(path=CATALOGUE_PATH):
+    """Read the activity CSV into a Catalogue (empty if the file is missing)"""
+    if not os.path.exists(path):
+        print(f"[Activity catalogue not found at {path} - local lookups disabled]")
+        return Catalogue()
+
+    activities = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        fields = {header: COLUMNS.get(header.strip().lower()) for header in reader.fieldnames or []}
+        for row in reader:
+            values = {attr: (row[header] or "").strip() for header, attr in fields.items() if attr}
+            if values.get("code"):
+                activities.append(Activity(**values))
+    return Catalogue(activities)
+
+
+_catalogue = None
+_lock = threading.Lock()
+
+
+def get_catalogue():
+    """Return the process-wide catalogue, loading it on first call"""
+    global _catalogue
+    if _catalogue is None:
+        with _lock:
+            if _catalogue is None:
+                _catalogue = load_catalogue()
+    return _catalogue
+
+
+# Recommendation fields that must come from the database rather than the LLM
+_CODE_LINE = re.compile(r"Activity Code:\W*(\d{4}\.\d{2})")
+_FIELD_LINES = {
+    "Group": lambda a: a.group,
+    "Third Party Approval": lambda a: f"Yes - {a.third_party}" if a.needs_approval else "No",
+    "When": lambda a: a.when or "N/A",
+    "Risk Rating": lambda a: a.risk_rating,
+    "Industry Risk": lambda a: a.industry_risk or "N/A",
+}
+
+
+def find_activities(recommendations, catalogue=None):
+    """Catalogue activities named on 'Activity Code:' lines, in order of appearance"""
+    if catalogue is None:
+        catalogue = get_catalogue()
+    found = []
+    for code in _CODE_LINE.findall(recommendations or ""):
+        activity = catalogue.get(code)
+        if activity and activity not in found:
+            found.append(activity)
+    return found
+
+
+def format_fields(activities):
+    """One line of database fields per activity (code, name, group, risk, approval, when)"""
+    return "\n".join(
+        f"- {a.code} | {a.name} | Group {a.group} | Risk {a.risk_rating} "
+        f"| Third Party {a.third_party if a.needs_approval else 'N/A'} | When {a.when or 'N/A'}"
+        for a in activities
+    )
+
+
+def correct_fields(recommendations, catalogue=None):
+    """Overwrite database fields in a recommendation text with catalogue values
+
+    Each RECOMMENDATION block is located by its 'Activity Code:' line; the Group,
+    Third Party Approval, When, Risk Rating and Industry Risk lines of that block
+    are replaced with the exact values from the catalogue.
+    """
+    if catalogue is None:
+        catalogue = get_catalogue()
+    if not recommendations or not len(catalogue):
+        return recommendations
+
+    blocks = re.split(r"(?=^\s*RECOMMENDATION \d)", recommendations, flags=re.MULTILINE)
+    corrected = []
+    for block in blocks:
+        match = _CODE_LINE.search(block)
+        activity = catalogue.get(match.group(1)) if match else None
+        if activity:
+            for label, value in _FIELD_LINES.items():
+                new_value = value(activity)
+                if new_value:
+                    block = re.sub(rf"^(\s*{label}:).*$", lambda m: f"{m.group(1)} {new_value}",
+                                   block, count=1, flags=re.MULTILINE)
+        corrected.append(block)
+    return "".join(corrected)
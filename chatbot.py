@@ -1,22 +1,19 @@
-import os
-from dotenv import load_dotenv
-from llama_cloud_services import LlamaCloudIndex
-from llama_index.llms.openai import OpenAI
-from llama_index.core.prompts import PromptTemplate
-
-load_dotenv()
-
-# Initialize
-print("Initializing Meydan Free Zone Sales Assistant...")
-index = LlamaCloudIndex(
-    name="business_activity_intelligence-1759747899",
-    project_name="Default",
-    organization_id=os.getenv("LLAMA_CLOUD_ORGANIZATION_ID"),
-    api_key=os.getenv("LLAMA_CLOUD_API_KEY"),
-)
-
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-llm = OpenAI(model="gpt-4o", temperature=0.1)
+import bm25
+import catalogue
+import country_risk
+import hub_digests
+import intents
+import multi_retrieval
+import prompt_builder
+import recommendation_cache
+import recommendation_records
+import router
+import sessions
+import stage_cache
+import streaming
+import tracing
+
+# Index and LLM are created lazily by services.py on first use; router.py picks the model per request type
 
 # System Prompt
 SYSTEM_PROMPT = """You are an expert Meydan Free Zone business activity consultant with comprehensive knowledge of 2,267 business activities across multiple sources.
@@ -107,19 +104,56 @@ CRITICAL RULES:
 
 Be precise, strategic, and consultative. Ensure recommendations maximize customer success while adhering to regulations."""
 
+# Output format sent with every recommendation request (rules and reasoning steps live in SYSTEM_PROMPT);
+# answers are schema-constrained JSON parsed into recommendation_records.Recommendation
+RECOMMENDATION_COUNT = 3
+RECOMMENDATION_FORMAT = recommendation_records.format_instructions(RECOMMENDATION_COUNT)
+
+class RecommendationVariant:
+    """Prompt, ranking and cache settings of one front end's recommendation pipeline
+
+    name tags the cache keys; prioritization is the per-persona weighting text of the profile
+    context; top_k is the Business Activities top_k per persona; weights and
+    min_relative_correlation go to scoring.rank_candidates (None for its defaults); warm
+    serves answers pre-warmed by warm_cache.py.
+    """
+    __slots__ = ("name", "system_prompt", "count", "output_format", "prioritization", "top_k", "kb_top_k",
+                 "weights", "min_relative_correlation", "warm")
+
+    def __init__(self, name, system_prompt, count, output_format, prioritization, top_k, kb_top_k=2,
+                 weights=None, min_relative_correlation=None, warm=False):
+        self.name = name
+        self.system_prompt = system_prompt
+        self.count = count
+        self.output_format = output_format
+        self.prioritization = prioritization
+        self.top_k = top_k
+        self.kb_top_k = kb_top_k
+        self.weights = weights
+        self.min_relative_correlation = min_relative_correlation
+        self.warm = warm
+
+# CLI, web server and batch; app_streamlit.py defines its own variant
+CHATBOT = RecommendationVariant(
+    "chatbot", SYSTEM_PROMPT, RECOMMENDATION_COUNT, RECOMMENDATION_FORMAT,
+    prioritization={
+        "Residential": "Apply weights: Risk (40%) + Third-Party Approval (40%) + Correlation (20%)\n"
+                       "Accept 70-80% correlation if it means Low risk and N/A approval",
+        "Business": "Apply weights: Correlation (60%) + Risk (25%) + Third-Party Approval (15%)\n"
+                    "STRICT REQUIREMENT: Minimum 90% correlation with business description\n"
+                    "This is a genuine entrepreneur - exact activity match is critical",
+    },
+    top_k={"Business": 15, "Residential": 10, "Finance": 10},
+    kb_top_k=2,
+    warm=True,
+)
+
 # Customer profile storage
-customer_profile = {
-    "shareholders": None,
-    "nationalities": [],
-    "visas_needed": None,
-    "business_description": None,
-    "experience": None,
-    "flexibility": None,
-    "purpose": None,
-    "timeline": None,
-    "persona": None,
-    "persona_answers": {}
-}
+def new_profile():
+    """Empty customer profile"""
+    return sessions.CustomerProfile()
+
+customer_profile = new_profile()
 
 # Questions
 initial_questions = [
@@ -147,6 +181,19 @@ persona_questions = {
     ]
 }
 
+# Profile field filled by each initial question
+profile_keys = ["shareholders", "visas_needed", "business_description", "experience",
+                "flexibility", "purpose", "timeline"]
+
+persona_choices = {"a": "Residential", "b": "Business", "c": "Finance"}
+
+# (persona_answers key, max words kept) for each persona question
+persona_answer_keys = {
+    "Residential": [("dependents", 15), ("residency_plan", 15)],
+    "Business": [("business_model", 20)],
+    "Finance": [("invoicing", 15), ("bank_purpose", 15), ("tax_strategy", 15)]
+}
+
 def parse_nationalities(shareholder_answer):
     """Extract nationalities from shareholder answer"""
     # Simple extraction - GPT will help parse this better in production
@@ -177,13 +224,86 @@ def concise_summary(answer, max_words=15):
         return answer
     return " ".join(words[:max_words]) + "..."
 
-def get_activity_recommendations(profile):
-    """Query index with persona-aware logic and chain-of-thought reasoning"""
+def record_initial_answer(profile, i, answer):
+    """Store the answer to initial question i in the profile"""
+    if i == 0:  # Shareholders question
+        words = answer.split()
+        profile['shareholders'] = words[0] if words and words[0].isdigit() else "Not specified"
+        profile['nationalities'] = answer
+    elif i == 3:  # Experience
+        profile['experience'] = interpret_experience(answer)
+    elif i == 4:  # Flexibility
+        profile['flexibility'] = interpret_flexibility(answer)
+    else:
+        profile[profile_keys[i]] = answer
+
+def select_persona(choice):
+    """Map a/b/c (or a persona name) to a persona, None if unrecognised"""
+    choice = choice.strip().lower()
+    if choice in persona_choices:
+        return persona_choices[choice]
+    for persona in persona_choices.values():
+        if choice == persona.lower():
+            return persona
+    return None
+
+def record_persona_answer(profile, i, answer):
+    """Store the answer to persona question i in the profile (blank answers are not recorded)"""
+    if not answer.strip():
+        # Same profile as a lead without this column (batch.build_profile), so warmed answers match
+        return
+    persona = profile['persona']
+    key, max_words = persona_answer_keys[persona][i]
+    profile['persona_answers'][key] = concise_summary(answer, max_words=max_words)
+    if persona == "Business":
+        # Also append to business description for better correlation
+        profile['business_description'] += f" | {answer}"
+
+def qa_context(profile, question):
+    """Query text for a general question about the customer's case"""
+    return f"""
+Customer context: 
+- Persona: {profile['persona']}
+- Business: {profile['business_description']}
+- Nationalities: {profile['nationalities']}
+
+Question: {question}
+
+Provide a clear, helpful answer based on the knowledge sources (Business Activities, Activity Hubs, MFZ Knowledge Base).
+Use Mike's sales expertise for strategic guidance. Be consultative and honest.
+"""
+
+class LicenseBlocked(Exception):
+    """Country risk blocks the license, so no recommendations are generated"""
+
+
+def get_activity_recommendations(profile, variant=CHATBOT):
+    """Query index with persona-aware logic and chain-of-thought reasoning
+
+    Returns the Recommendation records; raises LicenseBlocked (with the reason) when
+    country risk blocks the license.
+    """
+    stream = stream_activity_recommendations(profile, variant)
+    stream.consume()
+    if stream.blocked:
+        raise LicenseBlocked(stream.blocked)
+    return stream.records
+
+def build_profile_context(profile, country_ratings=None, candidates=None, hubs=(), variant=CHATBOT,
+                          unresolved=()):
+    """Customer profile and local pre-computed context for the recommendation prompt
+
+    Rules and output format are sent separately (the variant's system prompt and format).
+    country_ratings are the locally resolved Finance nationality ratings, if any, and
+    unresolved the nationalities the local table does not know (still checked by the LLM);
+    candidates is a precomputed candidate_context() section; hubs are matching
+    hub_digests entries.
+    """
     
     persona = profile['persona']
+    country_ratings = country_ratings or {}
     
-    # Build comprehensive query
-    query_context = f"""
+    profile_context = f"""
 CUSTOMER PROFILE ANALYSIS:
 
 Persona Type: {persona}
@@ -200,85 +320,206 @@ Timeline: {profile['timeline']}
     
     # Add persona-specific context
     if persona == "Residential":
-        query_context += f"""
+        profile_context += f"""
 RESIDENTIAL PERSONA CONTEXT:
 - Dependents: {profile['persona_answers'].get('dependents', 'N/A')}
 - Residency Plan: {profile['persona_answers'].get('residency_plan', 'N/A')}
 
 PRIORITIZATION FOR THIS PERSONA:
-Apply weights: Risk (40%) + Third-Party Approval (40%) + Correlation (20%)
-Accept 70-80% correlation if it means Low risk and N/A approval
+{variant.prioritization['Residential']}
 """
     elif persona == "Business":
-        query_context += f"""
+        profile_context += f"""
 BUSINESS PERSONA CONTEXT:
 - Detailed Business Model: {profile['persona_answers'].get('business_model', 'N/A')}
 
 PRIORITIZATION FOR THIS PERSONA:
-Apply weights: Correlation (60%) + Risk (25%) + Third-Party Approval (15%)
-STRICT REQUIREMENT: Minimum 90% correlation with business description
-This is a genuine entrepreneur - exact activity match is critical
+{variant.prioritization['Business']}
 """
     elif persona == "Finance":
-        query_context += f"""
+        if country_ratings and not unresolved:
+            # Ratings resolved locally - no need to retrieve them from the Country Risk database
+            country_check = f"COUNTRY RISK RATINGS (already checked, no Override): {country_risk.format_ratings(country_ratings)}"
+        elif country_ratings:
+            # Some nationalities are not in the local table - the Override check still applies to them
+            country_check = (f"COUNTRY RISK RATINGS (already checked, no Override): {country_risk.format_ratings(country_ratings)}\n"
+                             f"CRITICAL: Check Country Risk Rating first for nationalities: {', '.join(unresolved)}\n"
+                             "IF any nationality has \"Override\" rating → Stop and respond \"Cannot issue license\"")
+        else:
+            country_check = (f"CRITICAL: Check Country Risk Rating first for nationalities: {profile['nationalities']}\n"
+                             "IF any nationality has \"Override\" rating → Stop and respond \"Cannot issue license\"")
+        profile_context += f"""
 FINANCE PERSONA CONTEXT:
 - Invoicing Method: {profile['persona_answers'].get('invoicing', 'N/A')}
 - Bank Account Purpose: {profile['persona_answers'].get('bank_purpose', 'N/A')}
 - Tax Strategy: {profile['persona_answers'].get('tax_strategy', 'N/A')}
 
-CRITICAL: Check Country Risk Rating first for nationalities: {profile['nationalities']}
-IF any nationality has "Override" rating → Stop and respond "Cannot issue license"
+{country_check}
 IF acceptable ratings → Calculate bank account opening probability using nationality + activity risk matrix
 Apply standard prioritization after country risk check passes
 """
     
-    query_context += """
+    if candidates is None:
+        candidates = candidate_context(profile, country_ratings, variant)
+    profile_context += candidates
+    
+    # Precomputed Activity Hubs guidance (replaces hub retrieval for popular activities)
+    if hubs:
+        profile_context += "\n" + hub_digests.format_digests(hubs)
+    return profile_context
 
-CHAIN-OF-THOUGHT ANALYSIS REQUIRED:
-1. Analyze the business description and identify core activities
-2. Search Activity Hubs for popular activity matches (e-commerce, general trading, consultancy, IT, advertising, etc.)
-3. Search Business Activities Database for all possible matches using keywords and synonyms
-4. Apply persona-specific prioritization weights
-5. For each candidate activity, evaluate:
-   - Semantic correlation strength (90%+ for Business, 70%+ for Residential/Finance)
-   - Risk rating (Low preferred, High only when necessary)
-   - Third-party approval status (N/A preferred)
-   - Group optimization (fewer groups better)
-6. Consider Mike's strategic insights (avoid general trading, suggest specific alternatives, flag banking challenges)
-7. Validate final recommendations against decision matrix
-
-DELIVERABLE:
-Provide exactly 3 ranked activity recommendations following the format:
-
-RECOMMENDATION 1: [Primary Recommendation]
-Activity Code: [6-digit code]
-Activity Name: [Full name]
-Category: [Category]
-Group: [3-digit group]
-Description: [Full description from database]
-Third Party Approval: [Yes/No] [Authority if yes]
-When: [PRE/POST/N/A]
-Risk Rating: [Low/Medium/High]
-Industry Risk: [Yes/No/N/A]
-Match Explanation: [2-3 sentences explaining why this fits with persona logic applied]
-Related Activities:
-  - [Code]: [Name] - [1-line description]
-  - [Code]: [Name] - [1-line description]
-Expert Insights: [Strategic guidance from Activity Hubs or MFZ Knowledge Base if available]
-
-[Repeat for RECOMMENDATION 2 and 3]
+def candidate_context(profile, country_ratings=None, variant=CHATBOT):
+    """Pre-ranked catalogue candidates (and bank probabilities) section of the prompt"""
+    
+    # Exact keyword matches from the local catalogue, ranked with the persona weights (no network call)
+    import scoring  # NumPy is only loaded once recommendations are requested
+    persona = profile['persona']
+    context = ""
+    matches = bm25.get_retriever().retrieve(profile['business_description'], top_k=20)
+    if matches:
+        ranked = scoring.rank_candidates(matches, persona, weights=variant.weights,
+                                         min_relative_correlation=variant.min_relative_correlation)
+        context += f"""
+PRE-RANKED CANDIDATES (Business Activities Database, scored with {persona} persona weights):
+{scoring.format_ranking(ranked[:10])}
+Keep this ranking order - only write the explanations for the top picks.
+"""
+        if country_ratings:
+            table = scoring.bank_probability_table([activity for activity, _ in ranked[:10]], country_ratings)
+            context += f"""
+BANK ACCOUNT SUCCESS PROBABILITY (nationality x activity risk matrix - quote these, do not recompute):
+{scoring.format_bank_probability(table)}
 """
     
-    # Retrieve with appropriate top_k based on persona
-    top_k = 15 if persona == "Business" else 10
+    return context
+
+def plan_retrieval(profile, country_ratings=None, hubs=(), variant=CHATBOT, unresolved=()):
+    """(query, [(source, top_k)]) for the knowledge base retrieval"""
+    persona = profile['persona']
+    # Retrieve with appropriate top_k based on persona; Country Risk unless every nationality resolved locally
+    sources = multi_retrieval.plan_sources(business_top_k=variant.top_k[persona], kb_top_k=variant.kb_top_k,
+                                           country_risk=persona == "Finance" and (not country_ratings or bool(unresolved)),
+                                           activity_hubs=not hubs)
+    # The description alone, so retrieval can be pre-warmed per description x persona; the purpose
+    # reaches the LLM through the profile context
+    return profile['business_description'], sources
+
+def warm_stages(profile, variant=CHATBOT, store=None):
+    """Compute the description x persona stages (candidate ranking, retrieval) into the warm store
+
+    Used by warm_cache.py; synthesis reads the whole profile and always runs per customer.
+    Returns the retrieved nodes.
+    """
+    stages = stage_cache.StageRunner(profile, variant=variant.name,
+                                     warm=store or recommendation_cache.get_warm_store(), fill=True)
+    span = {}
+    stages.run("scoring", span, lambda: candidate_context(profile, variant=variant))
+    hubs = hub_digests.get_store().match(profile['business_description'])
+    retrieval_query, sources = plan_retrieval(profile, hubs=hubs, variant=variant)
+    nodes, _ = stages.run("retrieval", span, lambda: multi_retrieval.retrieve_all(retrieval_query, sources))
+    return nodes
+
+def stream_activity_recommendations(profile, variant=CHATBOT):
+    """Same as get_activity_recommendations, but returns a TimedStream of rendered recommendations
+
+    Iterate it (or pass it to st.write_stream) to display each recommendation as soon as it is
+    generated; .text then holds the final text and .records the Recommendation records, with
+    database fields taken from the catalogue. .blocked is the reason when country risk blocks
+    the license, else None.
+    """
     
-    retriever = index.as_retriever(similarity_top_k=top_k)
-    query_engine = index.as_query_engine(llm=llm, similarity_top_k=top_k)
+    persona = profile['persona']
+    trace = tracing.Trace("recommendation", persona=persona, model=router.model_for("synthesis"), route="synthesis")
+    
+    # Stages whose input fields are unchanged since an earlier run (see stage_cache.STAGE_FIELDS) are reused;
+    # scoring and retrieval for common description x persona pairs may have been pre-warmed by warm_cache.py
+    stages = stage_cache.StageRunner(profile, variant=variant.name,
+                                     warm=recommendation_cache.get_warm_store() if variant.warm else None)
+    
+    # Finance persona: country risk check runs locally before any retrieval or LLM call
+    country_ratings, unresolved = {}, []
+    with trace.span("country_check") as span:
+        if persona == "Finance":
+            country_ratings, unresolved = stages.run("country_check", span,
+                                                     lambda: country_risk.resolve_nationalities(profile['nationalities']))
+            span["unresolved"] = len(unresolved)
+            blocked = country_risk.blocked_countries(country_ratings)
+            if blocked:
+                trace.finish("blocked")
+                reason = f"Cannot issue license due to country risk rating ({', '.join(blocked)}: Override)."
+                stream = streaming.TimedStream([reason], label="Recommendations")
+                stream.records = []
+                stream.blocked = reason
+                return stream
+    
+    # Unchanged profile -> serve the previous answer instead of re-running retrieval and the LLM
+    with trace.span("cache_lookup") as span:
+        cache = recommendation_cache.get_cache()
+        cache_key = recommendation_cache.profile_key(profile, variant=variant.name)
+        cached = cache.get(cache_key)
+        span["hit"] = cached is not None
+    if cached is not None:
+        print("[Served from recommendation cache]")
+        trace.finish("cached")
+        records = [recommendation_records.Recommendation.from_dict(r) for r in cached]
+        stream = streaming.TimedStream([recommendation_records.render_all(records)], label="Recommendations")
+        stream.records = records
+        stream.blocked = None
+        return stream
+    
+    # Profile, pre-ranked catalogue candidates and bank probabilities - all computed locally
+    with trace.span("local_context") as span:
+        candidates = stages.run("scoring", span, lambda: candidate_context(profile, country_ratings, variant))
+        hubs = hub_digests.get_store().match(profile['business_description'])
+        span["hub_digests"] = len(hubs)
+        profile_context = build_profile_context(profile, country_ratings, candidates, hubs, variant, unresolved)
+        retrieval_query, sources = plan_retrieval(profile, country_ratings, hubs, variant, unresolved)
     
     print("\n[Applying chain-of-thought reasoning across all knowledge sources...]")
-    response = query_engine.query(query_context)
     
-    return response.response
+    usage = {}
+    
+    def tokens():
+        try:
+            # Hubs, activities, knowledge base (and country risk) are retrieved concurrently
+            with trace.span("retrieval") as span:
+                nodes, timings = stages.run("retrieval", span,
+                                            lambda: multi_retrieval.retrieve_all(retrieval_query, sources))
+                span["nodes"] = len(nodes)
+                if not span["reused"]:
+                    span.update({f"{source}_ms": round(seconds * 1000, 1) for source, seconds in timings.items()})
+            stages.report()
+            # System prompt + profile + format always fit; low-scoring nodes are trimmed to the budget
+            with trace.span("prompt_build") as span:
+                prompt = prompt_builder.assemble(variant.system_prompt, profile_context, variant.output_format, nodes)
+                span.update(nodes_used=prompt.nodes_used, nodes_dropped=prompt.nodes_dropped)
+            usage.update(prompt.usage())
+            trace.set(nodes=len(nodes), prompt_tokens=prompt.prompt_tokens)
+            # Each recommendation is shown as soon as its JSON object is complete and validated
+            with trace.span("llm") as span:
+                yield from tracing.first_token(trace, run.stream(router.get_llm("synthesis"), prompt))
+                span.update(records=len(run.records), rejected=len(run.rejected), repairs=run.repairs)
+            trace.observe("output_parse", run.parse_seconds)
+            usage.update(prompt.usage())
+            trace.set(completion_tokens=prompt.completion_tokens)
+        except Exception:
+            trace.finish("error")
+            raise
+    
+    def finish(text):
+        # Code, group, risk, approval and "When" come from the local catalogue, not the LLM
+        stream.records = run.records
+        if run.complete:  # a partial or free-text answer is regenerated next time, not served from cache
+            cache.put(cache_key, [record.to_dict() for record in run.records])
+        trace.finish()
+        return run.text()
+    
+    run = recommendation_records.StructuredRun(variant.count)
+    stream = streaming.TimedStream(tokens(), label="Recommendations", finalize=finish, usage=usage)
+    stream.records = []
+    stream.blocked = None
+    stream.trace = trace
+    return stream
 
 def print_summary_tables(profile, recommendations=None):
     """Print both summary tables"""
@@ -331,53 +572,52 @@ def print_summary_tables(profile, recommendations=None):
         print("\n" + "="*100)
         print("TABLE 2: BUSINESS ACTIVITY RECOMMENDATIONS")
         print("="*100 + "\n")
-        print(recommendations)
+        if isinstance(recommendations, streaming.TimedStream):
+            # Print tokens as they are generated, then continue with the final text
+            recommendations = streaming.print_stream(recommendations)
+            verified = catalogue.find_activities(recommendations)
+            if verified:
+                print("\n[Verified against the Business Activities Database]")
+                print(catalogue.format_fields(verified))
+        else:
+            print(recommendations)
+    
+    # Bank account success probability for each recommended activity x shareholder nationality
+    if recommendations and profile['persona'] == "Finance":
+        import scoring
+        table = scoring.bank_probability_table(catalogue.find_activities(recommendations),
+                                               country_risk.resolve_nationalities(profile['nationalities'])[0])
+        if table:
+            countries = list(table[0][1])
+            print("\n" + "─"*100)
+            print("BANK ACCOUNT SUCCESS PROBABILITY:")
+            print("─"*100)
+            print(f"{'Activity':<40} " + " ".join(f"{country[:18]:<19}" for country in countries))
+            for activity, row in table:
+                label = f"{activity.code} {activity.name}"[:39]
+                print(f"{label:<40} " + " ".join(f"{row[country]:<19.0%}" for country in countries))
     
     print("\n" + "="*100 + "\n")
 
 def update_field(profile, field_update):
     """Update customer profile field based on conversational input"""
-    field_lower = field_update.lower()
-    
-    # Parse updates
-    if "shareholder" in field_lower:
-        # Extract number and update
-        words = field_update.split()
-        for word in words:
-            if word.isdigit():
-                profile['shareholders'] = word
-                print(f"[Updated: Number of Shareholders = {word}]")
-                return True
-    
-    elif "visa" in field_lower:
-        words = field_update.split()
-        for word in words:
-            if word.isdigit():
-                profile['visas_needed'] = word
-                print(f"[Updated: Number of Visas = {word}]")
-                return True
-    
-    elif "business" in field_lower or "activity" in field_lower:
-        # Update business description
-        profile['business_description'] = field_update
-        print(f"[Updated: Business Description]")
-        return True
-    
-    elif "nationality" in field_lower or "passport" in field_lower:
-        profile['nationalities'] = field_update
-        print(f"[Updated: Nationalities]")
-        return True
-    
-    elif "timeline" in field_lower:
-        profile['timeline'] = field_update
-        print(f"[Updated: Timeline]")
-        return True
-    
-    return False
+    return apply_intent(profile, intents.classify(field_update))
+
+def apply_intent(profile, intent):
+    """Apply the slots of an "update" intent to the profile; False for any other intent"""
+    if intent.kind != "update":
+        return False
+    for field, value in intents.resolve_slots(intent.slots, profile).items():
+        profile[field] = value
+        print(f"[Updated: {intents.LABELS[field]} = {value}]")
+    return True
 
 def run_chatbot():
     """Main chatbot flow"""
     
+    tracing.serve_from_env()
+    hub_digests.get_store()  # pre-warm: loaded before the first recommendation
+    
     print("\n" + "="*100)
     print(" "*25 + "MEYDAN FREE ZONE SALES ASSISTANT")
     print("="*100)
@@ -385,22 +625,10 @@ def run_chatbot():
     print("Let's start by gathering some information.\n")
     
     # Ask initial questions
-    keys = ["shareholders", "visas_needed", "business_description", "experience", 
-            "flexibility", "purpose", "timeline"]
-    
     for i, question in enumerate(initial_questions):
         print(f"\nQ{i+1}: {question}")
         answer = input("Answer: ").strip()
-        
-        if i == 0:  # Shareholders question
-            customer_profile['shareholders'] = answer.split()[0] if answer.split()[0].isdigit() else "Not specified"
-            customer_profile['nationalities'] = answer
-        elif i == 3:  # Experience
-            customer_profile['experience'] = interpret_experience(answer)
-        elif i == 4:  # Flexibility
-            customer_profile['flexibility'] = interpret_flexibility(answer)
-        else:
-            customer_profile[keys[i]] = answer
+        record_initial_answer(customer_profile, i, answer)
     
     # Persona selection
     print("\nQ8: Which persona best fits this customer?")
@@ -408,63 +636,30 @@ def run_chatbot():
     print("  b. Business (genuine entrepreneur)")
     print("  c. Finance (banking/tax optimization)")
     
-    persona_choice = input("Select (a/b/c): ").strip().lower()
-    
-    if persona_choice == 'a':
-        customer_profile['persona'] = "Residential"
-    elif persona_choice == 'b':
-        customer_profile['persona'] = "Business"
-    elif persona_choice == 'c':
-        customer_profile['persona'] = "Finance"
-    else:
+    persona = select_persona(input("Select (a/b/c): "))
+    if persona is None:
         print("Invalid choice. Defaulting to Business persona.")
-        customer_profile['persona'] = "Business"
+        persona = "Business"
+    customer_profile['persona'] = persona
     
-    print(f"\n[Persona Identified: {customer_profile['persona']}]")
+    print(f"\n[Persona Identified: {persona}]")
     
     # Ask persona-specific questions
-    print(f"\n--- {customer_profile['persona'].upper()} PERSONA FOLLOW-UP QUESTIONS ---")
-    
-    persona = customer_profile['persona']
-    questions = persona_questions[persona]
+    print(f"\n--- {persona.upper()} PERSONA FOLLOW-UP QUESTIONS ---")
     
-    if persona == "Residential":
-        print(f"\nQ1: {questions[0]}")
-        ans1 = input("Answer: ").strip()
-        customer_profile['persona_answers']['dependents'] = concise_summary(ans1)
-        
-        print(f"\nQ2: {questions[1]}")
-        ans2 = input("Answer: ").strip()
-        customer_profile['persona_answers']['residency_plan'] = concise_summary(ans2)
-    
-    elif persona == "Business":
-        print(f"\nQ1: {questions[0]}")
-        ans1 = input("Answer: ").strip()
-        customer_profile['persona_answers']['business_model'] = concise_summary(ans1, max_words=20)
-        # Also append to business description for better correlation
-        customer_profile['business_description'] += f" | {ans1}"
-    
-    elif persona == "Finance":
-        print(f"\nQ1: {questions[0]}")
-        ans1 = input("Answer: ").strip()
-        customer_profile['persona_answers']['invoicing'] = concise_summary(ans1)
-        
-        print(f"\nQ2: {questions[1]}")
-        ans2 = input("Answer: ").strip()
-        customer_profile['persona_answers']['bank_purpose'] = concise_summary(ans2)
-        
-        print(f"\nQ3: {questions[2]}")
-        ans3 = input("Answer: ").strip()
-        customer_profile['persona_answers']['tax_strategy'] = concise_summary(ans3)
+    for i, question in enumerate(persona_questions[persona]):
+        print(f"\nQ{i+1}: {question}")
+        answer = input("Answer: ").strip()
+        record_persona_answer(customer_profile, i, answer)
     
     # Generate initial recommendations
     print("\n[Analyzing customer requirements across all knowledge sources...]")
     print("[Applying persona-specific prioritization logic...]")
     print("[Searching 2,267 activities + expert insights...]")
     
-    recommendations = get_activity_recommendations(customer_profile)
+    recommendations = stream_activity_recommendations(customer_profile)
     
-    # Display summary tables
+    # Display summary tables (recommendations stream into Table 2 as they are generated)
     print_summary_tables(customer_profile, recommendations)
     
     # Interactive conversation
@@ -477,8 +672,6 @@ def run_chatbot():
     print("Type 'done' to end conversation")
     print("─"*100 + "\n")
     
-    query_engine = index.as_query_engine(llm=llm, similarity_top_k=5)
-    
     while True:
         user_input = input("\nYour input: ").strip()
         
@@ -486,32 +679,30 @@ def run_chatbot():
             print("\nThank you for using Meydan Free Zone Sales Assistant!")
             break
         
-        elif user_input.lower() == 'refresh':
+        # Refresh, profile update or question - classified locally, no LLM call
+        intent = intents.classify(user_input)
+        
+        if intent.kind == "refresh":
             print("\n[Regenerating recommendations with updated information...]")
-            recommendations = get_activity_recommendations(customer_profile)
+            recommendations = stream_activity_recommendations(customer_profile)
             print_summary_tables(customer_profile, recommendations)
         
         else:
             # Check if this is a field update
-            is_update = update_field(customer_profile, user_input)
+            before = customer_profile.to_dict()
+            is_update = apply_intent(customer_profile, intent)
             
             if is_update:
+                stages = stage_cache.stages_for(stage_cache.changed_fields(before, customer_profile),
+                                                customer_profile['persona'])
+                print(f"[Refresh will recompute: {', '.join(stages)}]")
                 print("Type 'refresh' to see updated recommendations, or continue asking questions.")
             else:
                 # General Q&A
-                context = f"""
-Customer context: 
-- Persona: {customer_profile['persona']}
-- Business: {customer_profile['business_description']}
-- Nationalities: {customer_profile['nationalities']}
-
-Question: {user_input}
-
-Provide a clear, helpful answer based on the knowledge sources (Business Activities, Activity Hubs, MFZ Knowledge Base).
-Use Mike's sales expertise for strategic guidance. Be consultative and honest.
-"""
-                response = query_engine.query(context)
-                print(f"\nAnswer: {response.response}")
+                context = qa_context(customer_profile, user_input)
+                print("\nAnswer: ", end="")
+                # Small model for Q&A, large model only when the question asks for other activities
+                streaming.print_stream(streaming.TimedStream(router.query_tokens(user_input, context), label="Answer"))
 
 if __name__ == "__main__":
     run_chatbot()
\ No newline at end of file
@@ -0,0 +1,108 @@
+import csv
+import os
+import re
+import threading
+
+# Local Country Risk Rating table for the Finance persona, loaded once per process.
+# Export the database sheet to CSV at data/country_risk.csv (or set COUNTRY_RISK_PATH)
+# with columns Country, Nationality (optional demonym, e.g. "Indian") and Rating
+# (Low / Medium / High / Override).
+
+COUNTRY_RISK_PATH = os.getenv(
+    "COUNTRY_RISK_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "country_risk.csv"),
+)
+
+OVERRIDE = "Override"
+
+# Separators between the nationalities of a shareholder answer, and the words around them that
+# are not nationalities ("2 shareholders, Indian and British passports")
+_PARTS = re.compile(r"[,;/&+()\n]|\band\b|\bplus\b")
+_FILLER = re.compile(r"\b(?:\d+|x|a|an|the|of|from|with|each|both|all|is|are|one|two|three|four|five|six|seven|"
+                     r"eight|nine|ten|shareholders?|partners?|owners?|directors?|investors?|persons?|people|"
+                     r"passports?|holders?|nationals?|citizens?|nationalit(?:y|ies))\b|[^\w\s-]")
+
+
+class CountryRiskTable:
+    """Nationality/country name -> risk rating, with free-text matching"""
+
+    def __init__(self, rows=()):
+        self.ratings = {}  # lower-cased name or demonym -> (country, rating)
+        for country, nationality, rating in rows:
+            for name in (country, nationality):
+                if name:
+                    self.ratings[name.strip().lower()] = (country.strip(), rating.strip().title())
+        names = sorted(self.ratings, key=len, reverse=True)
+        self.pattern = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")s?\b") if names else None
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def rating(self, name):
+        """Rating for an exact country or nationality name, or None"""
+        match = self.ratings.get(str(name).strip().lower())
+        return match[1] if match else None
+
+    def resolve(self, text):
+        """Find every country/nationality mentioned in free text
+
+        Returns an ordered {country: rating} dict and the list of names the table does not
+        know, e.g. for "2 shareholders, Indian and Martian passports" ->
+        ({"India": "Low"}, ["martian"]).
+        """
+        resolved = {}
+        if not text:
+            return resolved, []
+        text = str(text).lower()
+        if self.pattern:
+            for match in self.pattern.finditer(text):
+                country, rating = self.ratings[match.group(1)]
+                resolved.setdefault(country, rating)
+            text = self.pattern.sub(",", text)  # before splitting, so "trinidad and tobago" stays whole
+        unresolved = [" ".join(_FILLER.sub(" ", part).split()) for part in _PARTS.split(text)]
+        return resolved, [name for name in unresolved if name]
+
+
+def load_table(path=COUNTRY_RISK_PATH):
+    """Read the country risk CSV (empty table if the file is missing)"""
+    if not os.path.exists(path):
+        print(f"[Country risk table not found at {path} - ratings will be retrieved instead]")
+        return CountryRiskTable()
+
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+            rating = row.get("rating") or row.get("risk rating") or row.get("country risk rating")
+            if row.get("country") and rating:
+                rows.append((row["country"], row.get("nationality", ""), rating))
+    return CountryRiskTable(rows)
+
+
+_table = None
+_lock = threading.Lock()
+
+
+def get_table():
+    """Return the process-wide country risk table, loading it on first call"""
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                _table = load_table()
+    return _table
+
+
+def resolve_nationalities(text):
+    """({country: rating}, [unresolved name, ...]) for the nationalities in a shareholder answer"""
+    return get_table().resolve(text)
+
+
+def blocked_countries(ratings):
+    """Countries whose rating is Override (license cannot be issued)"""
+    return [country for country, rating in ratings.items() if rating == OVERRIDE]
+
+
+def format_ratings(ratings):
+    """Render resolved ratings as a single prompt line"""
+    return ", ".join(f"{country}: {rating}" for country, rating in ratings.items())
@@ -0,0 +1,432 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.base.llms.types import CompletionResponse, LLMMetadata
+from llama_index.core.llms import CustomLLM
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from pydantic import PrivateAttr
+
+import retrieval_cache
+
+# Offline stand-ins for LlamaCloud and OpenAI, selected with MEYDAN_BACKEND:
+#   live   - real services (default)
+#   record - real services; every retrieval and completion is saved to MEYDAN_RECORDINGS
+#   replay - no network: recorded node sets and completions are replayed with injected
+#            latency and errors, for offline tests and performance / concurrency experiments
+#
+# Latency specs (seconds): "0", "fixed:0.5", "uniform:0.2,1.0", "normal:0.8,0.2",
+# "lognormal:0.8,0.5" (median, sigma).
+#   MEYDAN_FAKE_RETRIEVAL_LATENCY  per retrieval call
+#   MEYDAN_FAKE_TTFT               before the first completion token
+#   MEYDAN_FAKE_TOKEN_LATENCY      between completion tokens
+#   MEYDAN_FAKE_ERROR_RATE         probability a call fails (0-1)
+#   MEYDAN_FAKE_ERROR_STATUS       HTTP status of injected errors (429 = rate limit)
+#   MEYDAN_FAKE_SEED               seed for reproducible latency / error sequences
+
+RECORDINGS_PATH = os.getenv(
+    "MEYDAN_RECORDINGS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings", "replay.json"),
+)
+MISS_COMPLETION_WORDS = int(os.getenv("MEYDAN_FAKE_COMPLETION_WORDS", "300"))
+
+
+def backend():
+    """Selected backend: live, record or replay"""
+    mode = os.getenv("MEYDAN_BACKEND", "live").strip().lower()
+    if mode not in ("live", "record", "replay"):
+        raise ValueError(f"MEYDAN_BACKEND must be live, record or replay (got {mode!r})")
+    return mode
+
+
+class Latency:
+    """Random delay drawn from a distribution spec such as 'lognormal:0.8,0.5'"""
+
+    def __init__(self, spec="0", rng=None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, params = spec.partition(":")
+        if not params:
+            kind, params = "fixed", kind
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(",") if p.strip()]
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec!r}")
+
+    def sample(self):
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = self.rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = self.rng.gauss(p[0], p[1])
+        else:
+            value = p[0] * self.rng.lognormvariate(0.0, p[1])
+        return max(0.0, value)
+
+    def sleep(self):
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self):
+        delay = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class FakeAPIError(Exception):
+    """Injected failure carrying an HTTP status code like the real client errors"""
+
+    def __init__(self, status_code, service):
+        super().__init__(f"Injected {service} error (HTTP {status_code})")
+        self.status_code = status_code
+
+
+class Faults:
+    """Latency distributions and error injection shared by the fake backends"""
+
+    def __init__(self, retrieval="0", ttft="0", token="0", error_rate=0.0, error_status=429, seed=None):
+        self.rng = random.Random(seed)
+        self.retrieval = Latency(retrieval, self.rng)
+        self.ttft = Latency(ttft, self.rng)
+        self.token = Latency(token, self.rng)
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+    @classmethod
+    def from_env(cls):
+        seed = os.getenv("MEYDAN_FAKE_SEED")
+        return cls(
+            retrieval=os.getenv("MEYDAN_FAKE_RETRIEVAL_LATENCY", "0"),
+            ttft=os.getenv("MEYDAN_FAKE_TTFT", "0"),
+            token=os.getenv("MEYDAN_FAKE_TOKEN_LATENCY", "0"),
+            error_rate=float(os.getenv("MEYDAN_FAKE_ERROR_RATE", "0")),
+            error_status=int(os.getenv("MEYDAN_FAKE_ERROR_STATUS", "429")),
+            seed=int(seed) if seed else None,
+        )
+
+    def maybe_fail(self, service):
+        if self.error_rate and self.rng.random() < self.error_rate:
+            raise FakeAPIError(self.error_status, service)
+
+
+class Recordings:
+    """JSON file of recorded retrievals (node records) and completions (text)"""
+
+    def __init__(self, path=RECORDINGS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = {"retrievals": {}, "completions": {}}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(*parts):
+        raw = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, kind, key):
+        with self._lock:
+            value = self.data[kind].get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(self, kind, key, value):
+        """Store and write the file atomically (safe to interrupt a recording session)"""
+        with self._lock:
+            self.data[kind][key] = value
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=1, default=str)
+            os.replace(tmp, self.path)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "retrievals": len(self.data["retrievals"]),
+                "completions": len(self.data["completions"]),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def retrieval_key(query, top_k, filters):
+    return Recordings.key("retrieve", query, top_k, None if filters is None else repr(filters))
+
+
+def catalogue_records(query, top_k):
+    """Replay-miss fallback: BM25 matches from the local activity catalogue as node records"""
+    import bm25
+    records = [
+        {
+            "id": f"catalogue-{activity.code}",
+            "score": score,
+            "text": (f"Activity Code: {activity.code}\nActivity Name: {activity.name}\n"
+                     f"Category: {activity.category}\nGroup: {activity.group}\n"
+                     f"Description: {activity.description}\nRisk Rating: {activity.risk_rating}"),
+            "metadata": {"source": "business_activities"},
+        }
+        for activity, score in bm25.get_retriever().retrieve(query, top_k=top_k)
+    ]
+    # Never return nothing: query engines skip the LLM call on an empty retrieval
+    return records or [{"id": "replay-miss", "score": 0.0, "text": "[No recorded retrieval for this query]", "metadata": {}}]
+
+
+class FakeRetriever(BaseRetriever):
+    """Replays recorded node sets for (query, top_k, filters)"""
+
+    def __init__(self, recordings, faults, top_k, filters=None):
+        super().__init__()
+        self._recordings = recordings
+        self._faults = faults
+        self._top_k = top_k
+        self._filters = filters
+
+    def _records(self, query_bundle):
+        self._faults.maybe_fail("LlamaCloud")
+        records = self._recordings.get("retrievals", retrieval_key(query_bundle.query_str, self._top_k, self._filters))
+        if records is None:
+            records = catalogue_records(query_bundle.query_str, self._top_k)
+        return retrieval_cache.from_records(records)
+
+    def _retrieve(self, query_bundle):
+        self._faults.retrieval.sleep()
+        return self._records(query_bundle)
+
+    async def _aretrieve(self, query_bundle):
+        await self._faults.retrieval.asleep()
+        return self._records(query_bundle)
+
+
+class RecordingRetriever(BaseRetriever):
+    """Passes retrievals through to a live retriever and saves the results"""
+
+    def __init__(self, retriever, recordings, top_k, filters=None):
+        super().__init__()
+        self._retriever = retriever
+        self._recordings = recordings
+        self._top_k = top_k
+        self._filters = filters
+
+    def _save(self, query_bundle, nodes):
+        key = retrieval_key(query_bundle.query_str, self._top_k, self._filters)
+        self._recordings.put("retrievals", key, retrieval_cache.to_records(nodes))
+        return nodes
+
+    def _retrieve(self, query_bundle):
+        return self._save(query_bundle, self._retriever.retrieve(query_bundle))
+
+    async def _aretrieve(self, query_bundle):
+        return self._save(query_bundle, await self._retriever.aretrieve(query_bundle))
+
+
+class FakeIndex:
+    """Stands in for LlamaCloudIndex: as_retriever() / as_query_engine() replay recordings"""
+
+    name = "replay"
+
+    def __init__(self, recordings, faults):
+        self.recordings = recordings
+        self.faults = faults
+
+    def as_retriever(self, similarity_top_k=10, filters=None, **kwargs):
+        return FakeRetriever(self.recordings, self.faults, similarity_top_k, filters)
+
+    def as_query_engine(self, llm=None, similarity_top_k=10, filters=None, **kwargs):
+        from llama_index.core.query_engine import RetrieverQueryEngine
+        return RetrieverQueryEngine.from_args(self.as_retriever(similarity_top_k, filters), llm=llm, **kwargs)
+
+
+class RecordingIndex(FakeIndex):
+    """Wraps a live index so every retriever it hands out records its results"""
+
+    def __init__(self, index, recordings):
+        self._index = index
+        self.recordings = recordings
+
+    def __getattr__(self, name):
+        # name, pipeline, ... of the live index (used for the retrieval cache fingerprint)
+        return getattr(self._index, name)
+
+    def as_retriever(self, similarity_top_k=10, filters=None, **kwargs):
+        retriever = self._index.as_retriever(similarity_top_k=similarity_top_k, filters=filters, **kwargs)
+        return RecordingRetriever(retriever, self.recordings, similarity_top_k, filters)
+
+
+def completion_key(prompt):
+    return Recordings.key("complete", prompt)
+
+
+def filler(words):
+    return " ".join(["lorem", "ipsum", "dolor", "sit", "amet"][i % 5] for i in range(words))
+
+
+def miss_completion(prompt, structured=False):
+    """Replay-miss fallback with a realistic length
+
+    For structured (response_format) requests this is schema-shaped JSON recommending the
+    activity codes that appear in the prompt, so parsing and validation are exercised too.
+    """
+    if not structured:
+        return "[No recorded completion for this prompt] " + filler(MISS_COMPLETION_WORDS)
+    codes = list(dict.fromkeys(re.findall(r"\b(\d{4}\.\d{2})\b", prompt)))[:3] or ["0000.00"]
+    words = max(1, MISS_COMPLETION_WORDS // len(codes))
+    return json.dumps({"recommendations": [
+        {"rank": i, "code": code, "name": f"Replayed activity {code}", "category": "", "group": "",
+         "description": "", "third_party": "No", "when": "N/A", "risk_rating": "Low", "industry_risk": "N/A",
+         "match_explanation": filler(words), "related": [], "expert_insights": ""}
+        for i, code in enumerate(codes, 1)
+    ]})
+
+
+def split_tokens(text):
+    """Word-sized chunks (keeping whitespace) to stream like an LLM"""
+    tokens, start = [], 0
+    for i in range(1, len(text)):
+        if text[i - 1].isspace() and not text[i].isspace():
+            tokens.append(text[start:i])
+            start = i
+    tokens.append(text[start:])
+    return [t for t in tokens if t]
+
+
+class FakeLLM(CustomLLM):
+    """Replays recorded completions with injected time-to-first-token and token latency"""
+
+    model: str = "replay"
+    _recordings: Recordings = PrivateAttr()
+    _faults: Faults = PrivateAttr()
+
+    def __init__(self, recordings, faults, model="replay", **kwargs):
+        super().__init__(model=model, **kwargs)
+        self._recordings = recordings
+        self._faults = faults
+
+    @property
+    def metadata(self):
+        # Chat model, so query engines call stream_chat just as they do with OpenAI
+        return LLMMetadata(model_name=self.model, is_chat_model=True)
+
+    def _text(self, prompt, kwargs):
+        self._faults.maybe_fail("OpenAI")
+        text = self._recordings.get("completions", completion_key(prompt))
+        return text if text is not None else miss_completion(prompt, "response_format" in kwargs)
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        text = self._text(prompt, kwargs)
+        self._faults.ttft.sleep()
+        for _ in split_tokens(text)[1:]:
+            self._faults.token.sleep()
+        return CompletionResponse(text=text)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        text = self._text(prompt, kwargs)
+
+        def gen():
+            self._faults.ttft.sleep()
+            so_far = ""
+            for i, token in enumerate(split_tokens(text)):
+                if i:
+                    self._faults.token.sleep()
+                so_far += token
+                yield CompletionResponse(text=so_far, delta=token)
+
+        return gen()
+
+
+class RecordingLLM(CustomLLM):
+    """Passes calls through to a live LLM and saves each completion"""
+
+    model: str = "recording"
+    _llm = PrivateAttr()
+    _recordings: Recordings = PrivateAttr()
+
+    def __init__(self, llm, recordings, **kwargs):
+        super().__init__(model=llm.metadata.model_name, **kwargs)
+        self._llm = llm
+        self._recordings = recordings
+
+    @property
+    def metadata(self):
+        return self._llm.metadata
+
+    def _save(self, prompt, text):
+        self._recordings.put("completions", completion_key(prompt), text)
+
+    @llm_chat_callback()
+    def chat(self, messages, **kwargs):
+        response = self._llm.chat(messages, **kwargs)
+        self._save(self.messages_to_prompt(messages), response.message.content or "")
+        return response
+
+    @llm_chat_callback()
+    def stream_chat(self, messages, **kwargs):
+        prompt = self.messages_to_prompt(messages)
+
+        def gen():
+            chunks = []
+            for response in self._llm.stream_chat(messages, **kwargs):
+                chunks.append(response.delta or "")
+                yield response
+            self._save(prompt, "".join(chunks))
+
+        return gen()
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        response = self._llm.complete(prompt, formatted=formatted, **kwargs)
+        self._save(prompt, response.text)
+        return response
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        def gen():
+            chunks = []
+            for response in self._llm.stream_complete(prompt, formatted=formatted, **kwargs):
+                chunks.append(response.delta or "")
+                yield response
+            self._save(prompt, "".join(chunks))
+
+        return gen()
+
+
+_recordings = None
+_faults = None
+_lock = threading.Lock()
+
+
+def get_recordings():
+    """Process-wide recordings file"""
+    global _recordings
+    if _recordings is None:
+        with _lock:
+            if _recordings is None:
+                _recordings = Recordings()
+    return _recordings
+
+
+def get_faults():
+    """Process-wide latency / error injection settings from the environment"""
+    global _faults
+    if _faults is None:
+        with _lock:
+            if _faults is None:
+                _faults = Faults.from_env()
+    return _faults
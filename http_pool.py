@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+from collections import Counter
+
+import httpx
+
+# One shared, pooled HTTP transport for OpenAI and LlamaCloud: keep-alive connections,
+# bounded pool size, HTTP/2 when the h2 package is installed, and utilisation counters.
+# The async client lives on a single background event loop so its connections are reused
+# across calls instead of being tied to a short-lived asyncio.run() loop.
+
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+
+
+def http2_available():
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2]); HTTP_HTTP2=0 disables it"""
+    if os.getenv("HTTP_HTTP2", "1") == "0":
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class PoolMonitor:
+    """Request counters fed by httpx event hooks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0  # requests sent and still waiting for response headers
+        self.peak_in_flight = 0
+        self.by_host = Counter()
+
+    def started(self, host):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.by_host[host] += 1
+
+    def finished(self):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "by_host": dict(self.by_host),
+            }
+
+
+monitor = PoolMonitor()
+
+_lock = threading.Lock()
+_client = None
+_async_client = None
+_loop = None
+
+
+def _limits():
+    return httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE,
+                        keepalive_expiry=KEEPALIVE_EXPIRY)
+
+
+def get_client():
+    """Shared synchronous httpx.Client"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(
+                    limits=_limits(), timeout=TIMEOUT, http2=http2_available(),
+                    event_hooks={
+                        "request": [lambda request: monitor.started(request.url.host)],
+                        "response": [lambda response: monitor.finished()],
+                    },
+                )
+    return _client
+
+
+def get_async_client():
+    """Shared httpx.AsyncClient, bound to the background event loop (see run_async)"""
+    global _async_client
+    if _async_client is None:
+        with _lock:
+            if _async_client is None:
+                async def on_request(request):
+                    monitor.started(request.url.host)
+
+                async def on_response(response):
+                    monitor.finished()
+
+                _async_client = httpx.AsyncClient(
+                    limits=_limits(), timeout=TIMEOUT, http2=http2_available(),
+                    event_hooks={"request": [on_request], "response": [on_response]},
+                )
+    return _async_client
+
+
+def get_loop():
+    """Background event loop that owns every async HTTP connection"""
+    global _loop
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-pool-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_async(coro):
+    """Run a coroutine on the background loop and wait for its result (sync callers)"""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+
+async def arun(coro):
+    """Await a coroutine on the background loop from another event loop (ASGI handlers)"""
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_loop()))
+
+
+def _connection_counts(client):
+    """Open / idle connection counts from the httpcore pool (best effort)"""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []) or [])
+    idle = sum(1 for c in connections if getattr(c, "is_idle", lambda: False)())
+    return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+
+def pool_stats():
+    """Pool limits, connection counts and request counters for tuning pool size"""
+    stats = {
+        "limits": {"max_connections": MAX_CONNECTIONS, "max_keepalive": MAX_KEEPALIVE,
+                   "keepalive_expiry": KEEPALIVE_EXPIRY},
+        "http2": http2_available(),
+        **monitor.snapshot(),
+    }
+    if _client is not None:
+        stats["sync_connections"] = _connection_counts(_client)
+    if _async_client is not None:
+        stats["async_connections"] = _connection_counts(_async_client)
+    return stats
@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import catalogue
+
+# Precomputed Activity Hubs digests. An offline build step retrieves every hub guide from the
+# index once and condenses it into a compact digest (keywords, activity codes, related
+# activities, key insights) stored in data/hub_digests.json. At runtime the store is loaded at
+# startup; when a customer's business description matches a hub, its digest is injected into
+# the prompt and the Activity Hubs retrieval source is skipped. The build needs an activity_hubs
+# filter in MEYDAN_SOURCE_FILTERS (multi_retrieval.py) to tell hub guides from other documents,
+# and a way to tell the hubs apart: either a per-hub metadata key on every chunk (HUB_TITLE_KEYS,
+# e.g. "hub"), or - for a single "Activity Hubs.pdf" - a heading line naming each hub
+# ("E-commerce Hub"), on which the chunks are split. Document-level keys such as file_name or
+# title are not hub names. The build fails if fewer than 2 distinct hubs come back.
+#
+#   python hub_digests.py build                  # all catalogue activity names as hub queries
+#   python hub_digests.py build --topics topics.txt --workers 8
+#   python hub_digests.py match "online clothing store"
+
+DIGEST_PATH = os.getenv(
+    "HUB_DIGESTS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "hub_digests.json"),
+)
+
+# Node metadata naming the hub a chunk belongs to (first one present wins) - per hub, never per file
+HUB_TITLE_KEYS = tuple(key.strip() for key in os.getenv("HUB_TITLE_KEYS", "hub,hub_name").split(",") if key.strip())
+MIN_HUBS = 2
+HUB_TOP_K = 10
+MATCH_LIMIT = 2
+MAX_INSIGHTS = 5
+
+POPULAR_TOPICS = ["e-commerce", "general trading", "management consultancy", "IT services", "marketing",
+                  "real estate", "food trading", "travel agency", "event management", "holding company"]
+
+_CODE = re.compile(r"\b(\d{4}\.\d{2})\b")
+_FILE_EXTENSION = re.compile(r"\.(?:pdf|docx?|txt|md|html?)$", re.I)
+_TITLE_NOISE = re.compile(r"\b(?:\d{4}\.\d{2}|meydan|mfz|free\s+zone|activity|activities|codes?|hubs?|guides?)\b|[^\w\s&'-]",
+                         re.I)
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+# A short line naming a hub, e.g. "E-commerce Hub", "## Hub: General Trading"
+_HUB_HEADING = re.compile(r"^[ \t#*]*((?=[^\n]*\bhubs?\b)[^\n.!?]{3,80}?)[ \t*:]*$", re.I | re.M)
+
+SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["keywords", "codes", "related", "insights"],
+    "properties": {
+        "keywords": {"type": "array", "items": {"type": "string"},
+                     "description": "Business descriptions a customer might use for this hub, lower case"},
+        "codes": {"type": "array", "items": {"type": "string"}, "description": "Activity codes, e.g. 4791.01"},
+        "related": {"type": "array", "items": {"type": "string"}, "description": "Complementary activity codes"},
+        "insights": {"type": "array", "items": {"type": "string"},
+                     "description": f"At most {MAX_INSIGHTS} one-line expert insights (approvals, banking, pitfalls)"},
+    },
+}
+
+DIGEST_PROMPT = """Condense this Meydan Free Zone Activity Hub guide into a compact digest.
+Keep only what a sales consultant needs when recommending activities: the business descriptions
+it applies to, the activity codes it recommends, complementary activities, and at most {max_insights}
+one-line expert insights (approvals, banking, common pitfalls).
+
+HUB: {title}
+
+{text}"""
+
+
+# Offline build
+
+def hub_sections(node):
+    """[(hub title, text), ...] for a retrieved chunk
+
+    A chunk with a per-hub metadata key belongs to that hub whole; otherwise its text is split
+    on hub headings, and text before the first heading (a hub continued from an earlier chunk)
+    cannot be attributed and is dropped.
+    """
+    text = node.get_content()
+    for key in HUB_TITLE_KEYS:
+        if node.metadata.get(key):
+            return [(str(node.metadata[key]).strip(), text)]
+    headings = [m for m in _HUB_HEADING.finditer(text) if title_keyword(m.group(1))]
+    ends = [m.start() for m in headings[1:]] + [len(text)]
+    return [(m.group(1).strip(), text[m.start():end]) for m, end in zip(headings, ends)]
+
+
+def title_keyword(title):
+    """Hub title as a customer might phrase it: "E-commerce_Hub.pdf" -> "e-commerce" """
+    return " ".join(_TITLE_NOISE.sub(" ", _FILE_EXTENSION.sub("", title).replace("_", " ")).lower().split()).strip("-'& ")
+
+
+def build_topics(path=None):
+    """Hub queries: lines of a topics file, or every catalogue activity name"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    names = sorted({activity.name for activity in catalogue.get_catalogue().activities if activity.name})
+    return names or POPULAR_TOPICS
+
+
+def collect_hubs(topics, workers=8, top_k=HUB_TOP_K):
+    """{hub title: [chunk text, ...]} for every hub guide reached by the topic queries
+
+    Needs an activity_hubs filter in MEYDAN_SOURCE_FILTERS: unfiltered, every business
+    activity and knowledge base chunk would be digested as a hub. Chunks are assigned to hubs
+    by hub_sections(); raises ValueError when fewer than MIN_HUBS distinct hubs are found,
+    e.g. a single hubs document without a per-hub key or hub headings.
+    """
+    import multi_retrieval
+    import services
+    filters = multi_retrieval.source_filters("activity_hubs")
+    if filters is None:
+        raise ValueError('no Activity Hubs filter configured - set MEYDAN_SOURCE_FILTERS, e.g. '
+                         '\'{"key": "file_name", "activity_hubs": "Activity Hubs.pdf"}\'')
+    retriever = services.get_retriever(top_k, filters=filters)
+    hubs = {}
+    unattributed = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for nodes in pool.map(retriever.retrieve, topics):
+            for node in nodes:
+                sections = hub_sections(node.node)
+                if not sections:
+                    unattributed.add(node.node.node_id)
+                for i, (title, text) in enumerate(sections):
+                    hubs.setdefault(title, {})[(node.node.node_id, i)] = text
+    if unattributed:
+        print(f"[{len(unattributed)} chunks without a hub key or hub heading were skipped]")
+    if len(hubs) < MIN_HUBS:
+        raise ValueError(f"only {len(hubs)} distinct hub(s) found - tag each chunk with a per-hub metadata key "
+                         f"(HUB_TITLE_KEYS: {', '.join(HUB_TITLE_KEYS)}) or start each hub with a heading naming it")
+    return {title: list(chunks.values()) for title, chunks in hubs.items()}
+
+
+def extractive_digest(title, text, activities):
+    """Digest without an LLM: catalogue codes named in the guide and its opening sentences
+
+    Keywords are the cleaned hub title and the catalogue names of its codes.
+    """
+    codes = [code for code in dict.fromkeys(_CODE.findall(text)) if not len(activities) or activities.get(code)]
+    sentences = [s.strip() for s in _SENTENCE.split(" ".join(text.split())) if len(s.split()) > 4]
+    names = [activities.get(code).name for code in codes if len(activities) and activities.get(code)]
+    keywords = [k for k in dict.fromkeys([title_keyword(title)] + [" ".join(n.lower().split()) for n in names]) if k]
+    return {"keywords": keywords, "codes": codes, "related": [], "insights": sentences[:MAX_INSIGHTS]}
+
+
+def summarize_hub(llm, title, chunks, activities):
+    """Compact digest of one hub guide (LLM summary, falling back to an extractive digest)"""
+    from llama_index.core.llms import ChatMessage
+    text = "\n\n".join(chunks)
+    digest = extractive_digest(title, text, activities)
+    try:
+        response = llm.chat(
+            [ChatMessage(role="user", content=DIGEST_PROMPT.format(title=title, text=text, max_insights=MAX_INSIGHTS))],
+            response_format={"type": "json_schema",
+                             "json_schema": {"name": "hub_digest", "strict": True, "schema": SCHEMA}})
+        summary = json.loads(response.message.content or "")
+    except Exception as e:
+        print(f"[{title}: summary failed ({e}) - using extractive digest]")
+        summary = {}
+    if isinstance(summary, dict) and summary.get("insights"):
+        digest["keywords"] = [k.lower().strip() for k in summary.get("keywords") or [] if k.strip()] or digest["keywords"]
+        digest["insights"] = [i.strip() for i in summary["insights"] if i.strip()][:MAX_INSIGHTS]
+        digest["related"] = list(summary.get("related") or [])
+        digest["codes"] = list(dict.fromkeys(digest["codes"] + list(summary.get("codes") or [])))
+    if len(activities):
+        # Only codes that exist in the Business Activities Database
+        digest["codes"] = [c for c in digest["codes"] if activities.get(c)]
+        digest["related"] = [c for c in digest["related"] if activities.get(c) and c not in digest["codes"]]
+    return {"title": title, **digest, "chunks": len(chunks)}
+
+
+def build(output=DIGEST_PATH, topics=None, workers=8):
+    """Retrieve and digest every hub guide, writing the store atomically; returns the hub count"""
+    import router
+    activities = catalogue.get_catalogue()
+    start = time.perf_counter()
+    hubs = collect_hubs(topics or build_topics(), workers)
+    print(f"[Collected {len(hubs)} hub guides in {time.perf_counter() - start:.1f}s]")
+
+    llm = router.get_llm("digest")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        digests = list(pool.map(lambda item: summarize_hub(llm, item[0], item[1], activities), sorted(hubs.items())))
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp = output + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"built": time.strftime("%Y-%m-%dT%H:%M:%S"), "model": router.model_for("digest"),
+                   "hubs": digests}, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, output)
+    return len(digests)
+
+
+# Runtime store
+
+class DigestStore:
+    """Hub digests with a compiled keyword matcher"""
+
+    def __init__(self, hubs=()):
+        self.hubs = list(hubs)
+        self._by_phrase = {}
+        for hub in self.hubs:
+            for phrase in [hub["title"]] + list(hub.get("keywords") or []):
+                phrase = " ".join(phrase.lower().split())
+                if phrase:
+                    self._by_phrase.setdefault(phrase, []).append(hub)
+        phrases = sorted(self._by_phrase, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, phrases)) + r")\b") if phrases else None
+
+    def __len__(self):
+        return len(self.hubs)
+
+    def match(self, text, limit=MATCH_LIMIT):
+        """Digests whose title or keywords appear in text, most phrase hits first"""
+        if self._pattern is None or not text:
+            return []
+        scores = {}
+        for phrase in self._pattern.findall(" ".join(text.lower().split())):
+            for hub in self._by_phrase[phrase]:
+                scores[id(hub)] = (scores.get(id(hub), (0, hub))[0] + len(phrase.split()), hub)
+        ranked = sorted(scores.values(), key=lambda item: -item[0])
+        return [hub for _, hub in ranked[:limit]]
+
+
+def format_digests(hubs):
+    """Prompt section standing in for the Activity Hubs retrieval"""
+    lines = ["ACTIVITY HUB DIGESTS (precomputed from the Activity Hubs guides - use as the Activity Hubs source):"]
+    for hub in hubs:
+        lines.append(f"[{hub['title']}] Codes: {', '.join(hub['codes']) or 'N/A'}"
+                     f" | Related: {', '.join(hub['related']) or 'N/A'}")
+        lines.extend(f"- {insight}" for insight in hub["insights"])
+    return "\n".join(lines) + "\n"
+
+
+def load_store(path=DIGEST_PATH):
+    """Read the digest file into a DigestStore (empty if the file is missing)"""
+    if not os.path.exists(path):
+        print(f"[Activity Hubs digests not found at {path} - hubs will be retrieved]")
+        return DigestStore()
+    with open(path, encoding="utf-8") as f:
+        return DigestStore(json.load(f).get("hubs", []))
+
+
+_store = None
+_lock = threading.Lock()
+
+
+def get_store():
+    """Return the process-wide digest store, loading it on first call (call at startup to pre-warm)"""
+    global _store
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = load_store()
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the precomputed Activity Hubs digests")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="Retrieve and digest every hub guide")
+    build_parser.add_argument("--topics", help="File with one hub query per line (default: catalogue activity names)")
+    build_parser.add_argument("--output", default=DIGEST_PATH)
+    build_parser.add_argument("--workers", type=int, default=8)
+    match_parser = sub.add_parser("match", help="Show the digests injected for a business description")
+    match_parser.add_argument("text")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        try:
+            count = build(args.output, build_topics(args.topics), args.workers)
+        except ValueError as e:
+            raise SystemExit(f"[Build failed: {e}]")
+        print(f"[Built {count} hub digests in {time.perf_counter() - start:.1f}s] -> {args.output}")
+    else:
+        hubs = get_store().match(args.text)
+        print(format_digests(hubs) if hubs else "[No matching hub digest]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import re
+
+# Local intent classifier and slot extractor for chat input, so a turn is routed to refresh,
+# profile update or Q&A without an LLM call. Patterns are compiled once at import; classify()
+# takes a few microseconds.
+#
+#   classify("customer now wants five visas")  -> Intent("update", {"visas_needed": "5"})
+#   classify("add two more visas")  -> Intent("update", {"visas_needed": "+2"})  (see resolve_slots)
+#   classify("I run a bakery business")  -> Intent("update", {"business_description": "I run a bakery business"})
+#   classify("What business activities need DM approval?")  -> Intent("question")
+
+UNITS = {
+    "zero": 0, "one": 1, "single": 1, "two": 2, "couple": 2, "three": 3, "four": 4,
+    "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+    "dozen": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17,
+    "eighteen": 18, "nineteen": 19,
+}
+TENS = {"twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90}
+
+_UNIT = "|".join(sorted(UNITS, key=len, reverse=True))
+_TENS = "|".join(TENS)
+NUMBER = rf"(?:\d+|(?:{_TENS})(?:[\s-]+(?:{_UNIT}))?|(?:a\s+)?(?:{_UNIT}))"
+_NUMBER_RE = re.compile(rf"^(?:(?P<digits>\d+)|(?P<tens>{_TENS})(?:[\s-]+(?P<unit>{_UNIT}))?|(?:a\s+)?(?P<word>{_UNIT}))$", re.I)
+
+REFRESH_RE = re.compile(
+    r"^\W*(?:please\s+)?(?:refresh|regenerate|redo|re-?run|update|show(?:\s+me)?)"
+    r"(?:\s+(?:the|my|our))?(?:\s+(?:updated|new))?(?:\s+(?:recommendations?|results?|list|activities))?"
+    r"(?:\s+please)?\W*$", re.I)
+QUESTION_RE = re.compile(
+    r"^\W*(?:what|which|how|why|when|where|who|whose|is|are|can|could|do|does|did|should|would|will|may|"
+    r"tell\s+me|explain|list|compare)\b|\?\s*$", re.I)
+# Explicit edit verbs: a question-shaped turn is still an update when it uses one ("can you change visas to 4?")
+EDIT_RE = re.compile(r"\b(?:update|change|set|make\s+it|switch|increase|decrease|reduce|raise|lower|correct)\b", re.I)
+# Relative counts: "two more visas", "another two shareholders", "one fewer visa"
+_MORE = r"more|additional|extra|another"
+_FEWER = r"fewer|less"
+_RELATIVE_RE = re.compile(rf"\b(?:(?P<more>{_MORE})|(?P<fewer>{_FEWER}))\b", re.I)
+# Separator between a field name and its new value ("visas to 4", "business is now a bakery", "timeline: Q3")
+_VALUE = (r"\s*(?:[:=]\s*|(?:\b(?:is|are|will|be|should|has|have|changed?|changes|to|now|actually|becomes?)\b\s*)+)"
+          r"(?P<value>\S.*?)[\s.!?]*$")
+
+# (profile field, label, keyword pattern, kind); "number" slots need a count next to the keyword,
+# "text" slots take the text after a separator (or the whole turn), "description" slots take the
+# text after a separator, or the whole turn when it sets no other field
+FIELDS = [
+    ("shareholders", "Number of Shareholders", r"shareholders?|partners?|owners?", "number"),
+    ("visas_needed", "Number of Visas", r"visas?", "number"),
+    ("nationalities", "Nationalities", r"nationalit(?:y|ies)|passports?|citizenships?", "text"),
+    ("timeline", "Timeline", r"timeline|time\s*frame|launch\s+date|start\s+date", "text"),
+    ("business_description", "Business Description",
+     r"business(?:\s+(?:description|activity|activities|idea|model|plan))?|activit(?:y|ies)", "description"),
+]
+
+_SLOTS = []
+for _field, _label, _keyword, _kind in FIELDS:
+    if _kind == "number":
+        patterns = (re.compile(rf"(?:\b(?:another|an?\s+(?:additional|extra))\s+)?"
+                               rf"(?P<number>{NUMBER})\s+(?:\w+\s+){{0,2}}?(?:{_keyword})\b", re.I),
+                    re.compile(rf"\b(?:{_keyword})\b\s*(?:\w+\s+){{0,3}}?[:=]?\s*(?P<number>{NUMBER})\b", re.I))
+    else:
+        patterns = (re.compile(rf"\b(?:{_keyword})\b{_VALUE}", re.I), re.compile(rf"\b(?:{_keyword})\b", re.I))
+    _SLOTS.append((_field, _kind, patterns))
+
+LABELS = {field: label for field, label, _, _ in FIELDS}
+
+
+class Intent:
+    """Classified chat turn: kind is "refresh", "update" or "question"; slots maps field -> new value"""
+    __slots__ = ("kind", "slots")
+
+    def __init__(self, kind, slots=None):
+        self.kind = kind
+        self.slots = slots or {}
+
+    def __repr__(self):
+        return f"Intent({self.kind!r}, {self.slots!r})"
+
+
+def parse_number(text):
+    """Integer for "5", "five", "twenty-one", "a couple"; None if not a number"""
+    match = _NUMBER_RE.match(text.strip())
+    if match is None:
+        return None
+    if match.group("digits"):
+        return int(match.group("digits"))
+    if match.group("tens"):
+        return TENS[match.group("tens").lower()] + UNITS.get((match.group("unit") or "").lower(), 0)
+    return UNITS[match.group("word").lower()]
+
+
+def extract_slots(text):
+    """{field: value} for every profile field the turn sets
+
+    Relative counts are signed ("+2" for "two more visas"); resolve_slots applies them.
+    """
+    slots, mentioned = {}, []
+    for field, kind, (first, second) in _SLOTS:
+        if kind == "number":
+            match = first.search(text) or second.search(text)
+            if match:
+                number = parse_number(match.group("number"))
+                if number is not None:
+                    relative = _RELATIVE_RE.search(match.group(0))
+                    sign = "" if relative is None else "-" if relative.group("fewer") else "+"
+                    slots[field] = f"{sign}{number}"
+        else:
+            match = first.search(text)
+            if match:
+                slots[field] = match.group("value").strip()
+            elif kind == "text" and second.search(text):
+                slots[field] = text.strip()
+            elif kind == "description" and second.search(text):
+                mentioned.append(field)
+    if not slots:
+        # "I run a bakery business": a statement naming the business describes it
+        slots = {field: text.strip() for field in mentioned}
+    return slots
+
+
+def resolve_slots(slots, profile):
+    """Slots with relative counts ("+2", "-1") applied to the profile's current values"""
+    resolved = {}
+    for field, value in slots.items():
+        if value[:1] in "+-" and value[1:].isdigit():
+            current = re.search(rf"\b{NUMBER}\b", str(profile.get(field) or ""), re.I)
+            base = parse_number(current.group(0)) if current else 0
+            value = str(max(0, (base or 0) + int(value)))
+        resolved[field] = value
+    return resolved
+
+
+def classify(text):
+    """Intent for one chat turn"""
+    if REFRESH_RE.match(text):
+        return Intent("refresh")
+    if QUESTION_RE.search(text) and not EDIT_RE.search(text):
+        return Intent("question")
+    slots = extract_slots(text)
+    return Intent("update", slots) if slots else Intent("question")
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+import time
+
+import services
+
+# Multi-source retrieval: one query per knowledge source, each with its own top_k and
+# metadata filter, issued concurrently so wall time is that of the slowest source.
+
+# Metadata field that identifies the knowledge source of each node in the LlamaCloud index,
+# and the value used by each source, e.g.
+# MEYDAN_SOURCE_FILTERS='{"key": "file_name", "activity_hubs": "Activity Hubs.pdf", ...}'
+# Unset (the default), the index is queried once without filters, as before per-source
+# retrieval; a configured source that returns nothing is retried unfiltered.
+SOURCE_FILTERS = json.loads(os.getenv("MEYDAN_SOURCE_FILTERS", "{}"))
+
+COUNTRY_RISK_TOP_K = 3
+
+
+def source_filters(source):
+    """MetadataFilters selecting one knowledge source, or None when it has no configured filter"""
+    if not SOURCE_FILTERS.get("key") or not SOURCE_FILTERS.get(source):
+        return None
+    from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
+    return MetadataFilters(filters=[MetadataFilter(key=SOURCE_FILTERS["key"], value=SOURCE_FILTERS[source])])
+
+
+def plan_sources(business_top_k=10, kb_top_k=2, country_risk=False, activity_hubs=True):
+    """(source, top_k) pairs in prompt order - Step 1 to Step 4 of the retrieval strategy
+
+    Country Risk is only needed for the Finance persona when the local country risk
+    table could not resolve the nationalities; Activity Hubs is skipped when a
+    precomputed hub digest (hub_digests.py) already covers the business.
+    """
+    sources = [("activity_hubs", 3)] if activity_hubs else []
+    sources += [
+        ("business_activities", business_top_k),
+        ("mfz_knowledge_base", kb_top_k),
+    ]
+    if country_risk:
+        sources.append(("country_risk", COUNTRY_RISK_TOP_K))
+    return sources
+
+
+async def aretrieve_all(query, sources):
+    """Query every source concurrently; returns (merged nodes, {source: seconds})"""
+    timings = {}
+    if not any(source_filters(source) for source, _ in sources):
+        # No source filters configured: one unfiltered query, as large as the largest source
+        start = time.perf_counter()
+        nodes = await services.get_retriever(max(top_k for _, top_k in sources)).aretrieve(query)
+        timings["unfiltered"] = time.perf_counter() - start
+        return nodes, timings
+
+    async def retrieve(source, top_k):
+        start = time.perf_counter()
+        filters = source_filters(source)
+        nodes = await services.get_retriever(top_k, filters=filters).aretrieve(query)
+        if not nodes and filters is not None:
+            # Filter matched nothing (wrong key/value for this index?) - don't leave the source empty
+            print(f"[No nodes for source {source} with filter {SOURCE_FILTERS['key']}={SOURCE_FILTERS[source]!r}"
+                  f" - retrying unfiltered]")
+            nodes = await services.get_retriever(top_k).aretrieve(query)
+        timings[source] = time.perf_counter() - start
+        for node in nodes:
+            node.node.metadata.setdefault("knowledge_source", source)
+        return nodes
+
+    results = await asyncio.gather(*(retrieve(source, top_k) for source, top_k in sources))
+    return merge(results), timings
+
+
+def retrieve_all(query, sources):
+    """Synchronous wrapper around aretrieve_all (for the CLI and Streamlit)
+
+    Runs on the shared HTTP pool's event loop so pooled async connections are reused.
+    """
+    import http_pool
+    return http_pool.run_async(aretrieve_all(query, sources))
+
+
+def merge(results):
+    """Concatenate per-source node lists in source order, dropping duplicate nodes"""
+    merged, seen = [], set()
+    for nodes in results:
+        for node in nodes:
+            if node.node.node_id not in seen:
+                seen.add(node.node.node_id)
+                merged.append(node)
+    return merged
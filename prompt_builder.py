@@ -0,0 +1,104 @@
+import os
+
+# Token-budgeted prompt assembly: system rules, customer profile and instructions are always
+# sent; retrieved node text fills the remaining context budget, highest-scoring nodes first.
+
+CONTEXT_BUDGET = int(os.getenv("PROMPT_CONTEXT_BUDGET", "8000"))  # prompt tokens per call
+NODE_CHAR_LIMIT = int(os.getenv("PROMPT_NODE_CHAR_LIMIT", "2500"))  # max characters kept per node
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Token count with tiktoken when available, otherwise ~4 characters per token"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # Not installed, or the encoding file cannot be downloaded (offline)
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+class AssembledPrompt:
+    """System + user messages packed into the budget, with token accounting"""
+    __slots__ = ("system", "user", "prompt_tokens", "nodes_used", "nodes_dropped", "completion_tokens")
+
+    def __init__(self, system, user, prompt_tokens, nodes_used, nodes_dropped):
+        self.system = system
+        self.user = user
+        self.prompt_tokens = prompt_tokens
+        self.nodes_used = nodes_used
+        self.nodes_dropped = nodes_dropped
+        self.completion_tokens = None
+
+    def messages(self):
+        """llama_index ChatMessages for llm.chat / llm.stream_chat"""
+        from llama_index.core.llms import ChatMessage
+        return [ChatMessage(role="system", content=self.system), ChatMessage(role="user", content=self.user)]
+
+    def usage(self):
+        """Token counts for reporting"""
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "nodes_used": self.nodes_used,
+            "nodes_dropped": self.nodes_dropped,
+        }
+
+
+def format_node(node):
+    """One retrieved node as a labelled context block"""
+    source = node.node.metadata.get("knowledge_source", "knowledge base")
+    text = node.node.get_content().strip()
+    if len(text) > NODE_CHAR_LIMIT:
+        text = text[:NODE_CHAR_LIMIT] + "..."
+    score = f"{node.score:.2f}" if node.score is not None else "n/a"
+    return f"[{source} | score {score}]\n{text}"
+
+
+def assemble(system, profile_text, instructions, nodes=(), budget=CONTEXT_BUDGET):
+    """Pack rules, profile and retrieved nodes into the prompt budget
+
+    System rules, profile and instructions are never trimmed. Nodes are added in order
+    of retrieval score; at the first node that does not fit, it and every lower-scoring
+    node are dropped.
+    """
+    fixed_tokens = count_tokens(system) + count_tokens(profile_text) + count_tokens(instructions)
+    remaining = budget - fixed_tokens
+    if remaining <= 0 and nodes:
+        print(f"[Prompt budget exceeded by fixed parts ({fixed_tokens} of {budget} tokens) - "
+              f"all {len(nodes)} retrieved nodes dropped]")
+
+    ranked = sorted(nodes, key=lambda n: n.score if n.score is not None else 0.0, reverse=True)
+    blocks, used = [], 0
+    for node in ranked:
+        block = format_node(node)
+        tokens = count_tokens(block) + 2
+        if tokens > remaining:
+            break
+        blocks.append(block)
+        remaining -= tokens
+        used += 1
+
+    context = "RETRIEVED CONTEXT:\n\n" + "\n\n".join(blocks) if blocks else ""
+    user = "\n\n".join(part for part in (profile_text.strip(), context, instructions.strip()) if part)
+    prompt_tokens = count_tokens(system) + count_tokens(user)
+    return AssembledPrompt(system, user, prompt_tokens, used, len(ranked) - used)
+
+
+def stream_completion(llm, prompt, **kwargs):
+    """Stream the LLM answer for an assembled prompt, recording completion tokens
+
+    Extra keyword arguments (e.g. response_format) are passed to llm.stream_chat.
+    """
+    chunks = []
+    for chunk in llm.stream_chat(prompt.messages(), **kwargs):
+        if chunk.delta:
+            chunks.append(chunk.delta)
+            yield chunk.delta
+    prompt.completion_tokens = count_tokens("".join(chunks))
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Recommendation cache keyed by a canonical hash of the normalized customer profile.
+# "refresh" / "Regenerate Recommendations" on an unchanged profile is served from here.
+
+CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "256"))
+CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "3600"))  # seconds
+
+# Persistent store of pre-warmed pipeline stages (candidate ranking, retrieval nodes) for common
+# (business description x persona) pairs, filled by warm_cache.py and shared by every process
+WARM_PATH = os.getenv(
+    "RECOMMENDATION_WARM_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "warm_recommendations.sqlite3"),
+)
+WARM_TTL = float(os.getenv("RECOMMENDATION_WARM_TTL", str(7 * 24 * 3600)))  # seconds
+# Personas warmed by warm_cache.py; Finance scoring and retrieval also depend on nationalities
+WARM_PERSONAS = ("Residential", "Business")
+
+
+def normalize(value):
+    """Canonical form of a profile value: trimmed, lower-cased, single-spaced strings"""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize(v) for v in value]
+    return value
+
+
+def profile_key(profile, variant=""):
+    """SHA-256 of the normalized profile (plus a variant tag for differing prompts)"""
+    canonical = json.dumps({"variant": variant, "profile": normalize(dict(profile))},
+                           sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class RecommendationCache:
+    """Thread-safe LRU cache with TTL expiry and hit/miss counters"""
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expired entry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (self.clock(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drop one entry, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide recommendation cache"""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = RecommendationCache()
+    return _cache
+
+
+class WarmStore:
+    """SQLite-backed pre-warmed stage outputs, keyed by stage_cache.stage_key()"""
+
+    def __init__(self, path=WARM_PATH, ttl=WARM_TTL):
+        import sqlite3
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS warm ("
+            " key TEXT PRIMARY KEY, description TEXT NOT NULL, persona TEXT NOT NULL,"
+            " stored_at REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the warmed value, or None when missing or older than the TTL"""
+        with self._lock:
+            row = self._db.execute("SELECT stored_at, value FROM warm WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[1])
+
+    def put(self, key, value, description="", persona=""):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO warm (key, description, persona, stored_at, value) VALUES (?, ?, ?, ?, ?)",
+                (key, description, persona, time.time(), json.dumps(value, ensure_ascii=False)),
+            )
+            self._db.commit()
+
+    def fresh(self, key):
+        """True if key holds an entry that has not expired (does not count as a lookup)"""
+        with self._lock:
+            row = self._db.execute("SELECT stored_at FROM warm WHERE key = ?", (key,)).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM warm WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        """Delete every warmed entry; returns rows deleted"""
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM warm")
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM warm").fetchone()[0]
+        return {"size": size, "hits": self.hits, "misses": self.misses}
+
+
+_warm_store = None
+
+
+def get_warm_store():
+    """Return the process-wide warm store, opening it on first call"""
+    global _warm_store
+    if _warm_store is None:
+        with _lock:
+            if _warm_store is None:
+                _warm_store = WarmStore()
+    return _warm_store
@@ -0,0 +1,345 @@
+import json
+import time
+
+import catalogue
+import prompt_builder
+
+# Structured recommendation output: the LLM is asked for JSON matching SCHEMA (OpenAI structured
+# outputs), each recommendation is parsed as soon as its object is complete, database fields are
+# validated and filled from the local catalogue, and invalid entries are replaced with a small
+# follow-up request instead of regenerating everything.
+
+FIELDS = ("rank", "code", "name", "category", "group", "description", "third_party", "when",
+          "risk_rating", "industry_risk", "match_explanation", "related", "expert_insights")
+
+_RELATED_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["code", "name", "description"],
+    "properties": {
+        "code": {"type": "string"},
+        "name": {"type": "string"},
+        "description": {"type": "string", "description": "One line"},
+    },
+}
+
+SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["recommendations"],
+    "properties": {
+        "recommendations": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "additionalProperties": False,
+                "required": list(FIELDS),
+                "properties": {
+                    "rank": {"type": "integer"},
+                    "code": {"type": "string", "description": "Activity code, e.g. 1811.04"},
+                    "name": {"type": "string"},
+                    "category": {"type": "string"},
+                    "group": {"type": "string", "description": "3-digit group"},
+                    "description": {"type": "string", "description": "Full description from the database"},
+                    "third_party": {"type": "string", "description": "Yes - <authority> or No"},
+                    "when": {"type": "string", "enum": ["PRE", "POST", "N/A"]},
+                    "risk_rating": {"type": "string", "enum": ["Low", "Medium", "High"]},
+                    "industry_risk": {"type": "string", "enum": ["Yes", "No", "N/A"]},
+                    "match_explanation": {"type": "string"},
+                    "related": {"type": "array", "items": _RELATED_SCHEMA},
+                    "expert_insights": {"type": "string"},
+                },
+            },
+        },
+    },
+}
+
+
+def response_format():
+    """OpenAI response_format for schema-constrained recommendation output"""
+    return {"type": "json_schema", "json_schema": {"name": "activity_recommendations", "strict": True, "schema": SCHEMA}}
+
+
+def format_instructions(count, explanation="2-3 sentences explaining why this fits with persona logic applied",
+                        insights="Strategic guidance from Activity Hubs or MFZ Knowledge Base if available"):
+    """DELIVERABLE section of the prompt for `count` JSON recommendations"""
+    return f"""DELIVERABLE:
+Provide exactly {count} ranked activity recommendations as JSON: {{"recommendations": [...]}}, best match first.
+Each recommendation has these fields:
+- rank: 1 for the primary recommendation, then 2, 3...
+- code: activity code (6-digit format like 1811.04)
+- name, category, group (3-digit), description (full description from database)
+- third_party: "Yes - <authority>" or "No"
+- when: PRE/POST/N/A
+- risk_rating: Low/Medium/High
+- industry_risk: Yes/No/N/A
+- match_explanation: {explanation}
+- related: 2 complementary activities, each {{"code", "name", "description" (1 line)}}
+- expert_insights: {insights}"""
+
+
+class Recommendation:
+    """One ranked activity recommendation"""
+    __slots__ = FIELDS + ("issues",)
+
+    def __init__(self, code="", name="", category="", group="", description="", third_party="", when="",
+                 risk_rating="", industry_risk="", match_explanation="", related=(), expert_insights="", rank=0):
+        self.rank = rank
+        self.code = code
+        self.name = name
+        self.category = category
+        self.group = group
+        self.description = description
+        self.third_party = third_party
+        self.when = when
+        self.risk_rating = risk_rating
+        self.industry_risk = industry_risk
+        self.match_explanation = match_explanation
+        self.related = list(related)
+        self.expert_insights = expert_insights
+        self.issues = []  # validation notes (fields corrected from the catalogue, problems found)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build from parsed JSON, tolerating missing fields and wrong value types"""
+        values = {}
+        for field in FIELDS:
+            value = data.get(field)
+            if field == "rank":
+                values[field] = value if isinstance(value, int) else 0
+            elif field == "related":
+                values[field] = [
+                    {k: str(r.get(k) or "").strip() for k in ("code", "name", "description")}
+                    for r in (value if isinstance(value, list) else []) if isinstance(r, dict)
+                ]
+            else:
+                values[field] = "" if value is None else str(value).strip()
+        return cls(**values)
+
+    @classmethod
+    def from_activity(cls, activity, rank=0):
+        """Record built only from catalogue data (no LLM explanation)"""
+        record = cls(code=activity.code, name=activity.name, category=activity.category,
+                     description=activity.description, rank=rank)
+        record.apply_catalogue(activity)
+        return record
+
+    def apply_catalogue(self, activity):
+        """Overwrite database fields with the catalogue values, noting any that changed"""
+        values = {
+            "code": activity.code,
+            "group": activity.group,
+            "third_party": f"Yes - {activity.third_party}" if activity.needs_approval else "No",
+            "when": activity.when or "N/A",
+            "risk_rating": activity.risk_rating,
+            "industry_risk": activity.industry_risk or "N/A",
+        }
+        for field, value in values.items():
+            if value and getattr(self, field) != value:
+                if getattr(self, field):
+                    self.issues.append(f"{field} corrected from catalogue")
+                setattr(self, field, value)
+        for field in ("name", "category", "description"):
+            if not getattr(self, field) and getattr(activity, field):
+                setattr(self, field, getattr(activity, field))
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def render(self):
+        """Text block in the RECOMMENDATION layout used by the CLI, web and Streamlit UIs"""
+        related = "\n".join(f"  - {r['code']}: {r['name']} - {r['description']}" for r in self.related) or "  - N/A"
+        return (f"RECOMMENDATION {self.rank}: {self.name}\n"
+                f"Activity Code: {self.code}\n"
+                f"Activity Name: {self.name}\n"
+                f"Category: {self.category}\n"
+                f"Group: {self.group}\n"
+                f"Description: {self.description}\n"
+                f"Third Party Approval: {self.third_party}\n"
+                f"When: {self.when}\n"
+                f"Risk Rating: {self.risk_rating}\n"
+                f"Industry Risk: {self.industry_risk}\n"
+                f"Match Explanation: {self.match_explanation}\n"
+                f"Related Activities:\n{related}\n"
+                f"Expert Insights: {self.expert_insights}\n")
+
+    def __repr__(self):
+        return f"Recommendation({self.rank}, {self.code!r}, {self.name!r})"
+
+
+def render_all(records):
+    return "\n".join(record.render() for record in records)
+
+
+class ItemParser:
+    """Incremental parser: feed streamed JSON text, get each array item once it is complete
+
+    Picks out the objects of the first array in the document ({"recommendations": [{...}, ...]}
+    or a bare [{...}]) without waiting for the whole response.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._array_depth = None  # stack depth inside the items array; -1 once it has closed
+        self._item_start = None
+        self.errors = 0
+        self.found_array = False  # a JSON document with an array, even an empty one
+
+    def feed(self, chunk):
+        """Returns the list of item dicts completed by this chunk"""
+        self.text += chunk
+        items = []
+        for i in range(self._pos, len(self.text)):
+            ch = self.text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+            elif ch == "{" or ch == "[":
+                if ch == "[" and not self.found_array:
+                    self.found_array = self.text.lstrip()[:1] in ("{", "[")
+                if (ch == "{" and self._stack and self._stack[-1] == "["
+                        and self._array_depth in (None, len(self._stack))):
+                    self._array_depth = len(self._stack)
+                    self._item_start = i
+                self._stack.append(ch)
+            elif (ch == "}" or ch == "]") and self._stack:
+                self._stack.pop()
+                if ch == "}" and self._item_start is not None and len(self._stack) == self._array_depth:
+                    try:
+                        item = json.loads(self.text[self._item_start:i + 1])
+                        if isinstance(item, dict):
+                            items.append(item)
+                    except ValueError:
+                        self.errors += 1
+                    self._item_start = None
+                elif ch == "]" and self._array_depth not in (None, -1) and len(self._stack) < self._array_depth:
+                    self._array_depth = -1  # array finished; ignore anything after it
+        self._pos = len(self.text)
+        return items
+
+
+def validate(record, seen_codes, activities=None):
+    """Check one record against the catalogue; returns True if it can be shown
+
+    Database fields (group, approval, when, risk) are always taken from the catalogue.
+    A record is rejected when it has no code or name, repeats an earlier code, or -
+    with the catalogue loaded - names a code that does not exist.
+    """
+    activities = activities if activities is not None else catalogue.get_catalogue()
+    if not record.code or not record.name:
+        record.issues.append("missing code or name")
+        return False
+    code = catalogue.normalize_code(record.code)
+    if code in seen_codes:
+        record.issues.append("duplicate activity code")
+        return False
+    if len(activities):
+        activity = activities.get(code)
+        if activity is None:
+            record.issues.append("activity code not in catalogue")
+            return False
+        record.apply_catalogue(activity)
+        for related in record.related:
+            related_activity = activities.get(related.get("code", ""))
+            if related_activity is not None:
+                related["name"] = related["name"] or related_activity.name
+    seen_codes.add(code)
+    return True
+
+
+def fallback_records(text, activities=None):
+    """Records for a response that is not JSON: activities named in the text, from the catalogue"""
+    return [Recommendation.from_activity(a, rank=i)
+            for i, a in enumerate(catalogue.find_activities(text, activities), 1)]
+
+
+def repair_messages(messages, records, missing):
+    """Follow-up chat asking only for the recommendations that were missing or invalid"""
+    from llama_index.core.llms import ChatMessage
+    codes = ", ".join(r.code for r in records) or "none"
+    return list(messages) + [ChatMessage(role="user", content=(
+        f"{missing} more recommendation(s) are needed. Valid activity codes from the database only; "
+        f"do not repeat these codes: {codes}. Same JSON format, ranks continuing from {len(records) + 1}."
+    ))]
+
+
+class StructuredRun:
+    """Streams one structured recommendation request into validated Recommendation records"""
+
+    def __init__(self, count, activities=None):
+        self.count = count
+        self.activities = activities if activities is not None else catalogue.get_catalogue()
+        self.records = []
+        self.rejected = []
+        self.repairs = 0
+        self.fallback = False  # response was not JSON; text is the raw answer, corrected
+        self.parse_seconds = 0.0
+        self._seen = set()
+        self._text = None
+
+    def _accept(self, items):
+        """Validate parsed items; returns the newly accepted records"""
+        start = time.perf_counter()
+        accepted = []
+        for item in items:
+            if len(self.records) >= self.count:
+                break
+            record = Recommendation.from_dict(item)
+            if validate(record, self._seen, self.activities):
+                record.rank = len(self.records) + 1
+                self.records.append(record)
+                accepted.append(record)
+            else:
+                self.rejected.append(record)
+        self.parse_seconds += time.perf_counter() - start
+        return accepted
+
+    def stream(self, llm, prompt):
+        """Yield each recommendation's text block as soon as its JSON object is complete"""
+        parser = ItemParser()
+        for token in prompt_builder.stream_completion(llm, prompt, response_format=response_format()):
+            for record in self._accept(parser.feed(token)):
+                yield record.render() + "\n"
+
+        if not parser.found_array:
+            # Not JSON at all (e.g. a model without structured outputs): keep the text answer
+            self.fallback = True
+            self._text = catalogue.correct_fields(parser.text, self.activities)
+            self.records = fallback_records(parser.text, self.activities)
+            yield self._text
+            return
+
+        missing = self.count - len(self.records)
+        if missing > 0 and (self.rejected or parser.errors or not self.records):
+            # Ask only for the replacements instead of regenerating the whole answer
+            self.repairs += 1
+            try:
+                response = llm.chat(repair_messages(prompt.messages(), self.records, missing),
+                                    response_format=response_format())
+            except Exception as e:
+                print(f"[Could not replace {missing} invalid recommendation(s): {e}]")
+                return
+            content = response.message.content or ""
+            prompt.completion_tokens = (prompt.completion_tokens or 0) + prompt_builder.count_tokens(content)
+            for record in self._accept(ItemParser().feed(content)):
+                yield record.render() + "\n"
+
+    @property
+    def complete(self):
+        """True when the run produced all `count` structured records (safe to cache)"""
+        return not self.fallback and len(self.records) >= self.count
+
+    def text(self):
+        """Final answer text (rendered records, or the corrected raw text on fallback)"""
+        return self._text if self.fallback else render_all(self.records)
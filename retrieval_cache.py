@@ -0,0 +1,225 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+
+# Persistent retrieval cache: query text -> retrieved node ids, scores, text and metadata.
+# Stored in SQLite so it survives restarts; entries are tied to an index fingerprint and are
+# dropped as soon as the index is updated.
+
+CACHE_PATH = os.getenv(
+    "RETRIEVAL_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "retrieval.sqlite3"),
+)
+CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+# How often a running process re-reads the index version from LlamaCloud
+FINGERPRINT_TTL = float(os.getenv("RETRIEVAL_FINGERPRINT_TTL", "300"))  # seconds
+
+
+def index_fingerprint(index):
+    """Identifies the current index contents; changes whenever the index is updated
+
+    Uses the LlamaCloud pipeline id and last-update time, plus MEYDAN_INDEX_VERSION so
+    a re-ingest that does not touch the pipeline record can still be invalidated.
+    """
+    pipeline = getattr(index, "pipeline", None)
+    parts = [
+        str(getattr(index, "name", type(index).__name__)),
+        str(getattr(pipeline, "id", "")),
+        str(getattr(pipeline, "updated_at", "")),
+        os.getenv("MEYDAN_INDEX_VERSION", ""),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def refresh_pipeline(index):
+    """Re-read the index's pipeline record (and its updated_at) from LlamaCloud"""
+    client = getattr(index, "_client", None)
+    pipeline = getattr(index, "pipeline", None)
+    if client is None or pipeline is None:
+        return
+    try:
+        index.pipeline = client.pipelines.get_pipeline(pipeline_id=pipeline.id)
+    except Exception as e:
+        print(f"[Could not re-check the index version: {e}]")
+
+
+class Fingerprint:
+    """Current index fingerprint, re-checked against LlamaCloud at most every `ttl` seconds
+
+    A re-ingest while the process is running changes the fingerprint, so cached retrievals
+    from the old index stop being served and are purged.
+    """
+
+    def __init__(self, index, cache, ttl=FINGERPRINT_TTL, clock=time.monotonic):
+        self.index = index
+        self.cache = cache
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.value = index_fingerprint(index)
+        self._checked = clock()
+        cache.purge(keep_fingerprint=self.value)
+
+    def current(self):
+        if self.clock() - self._checked <= self.ttl:
+            return self.value
+        with self._lock:
+            if self.clock() - self._checked > self.ttl:
+                refresh_pipeline(self.index)
+                value = index_fingerprint(self.index)
+                if value != self.value:
+                    print("[Index updated - dropping cached retrievals]")
+                    self.cache.purge(keep_fingerprint=value)
+                    self.value = value
+                self._checked = self.clock()
+        return self.value
+
+
+class RetrievalCache:
+    """SQLite-backed store of retrieval results"""
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS retrievals ("
+            " key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, stored_at REAL NOT NULL, nodes TEXT NOT NULL)"
+        )
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(fingerprint, query, top_k, filters=None):
+        """Cache key for a query against one index version"""
+        raw = json.dumps([fingerprint, query, top_k, filters], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached node list, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT stored_at, nodes FROM retrievals WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[1])
+
+    def put(self, key, fingerprint, nodes):
+        """Store a node list (dicts with id, score, text, metadata)"""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO retrievals (key, fingerprint, stored_at, nodes) VALUES (?, ?, ?, ?)",
+                (key, fingerprint, time.time(), json.dumps(nodes, default=str)),
+            )
+            self._db.commit()
+
+    def purge(self, keep_fingerprint=None):
+        """Delete entries from other index versions (or everything); returns rows deleted"""
+        with self._lock:
+            if keep_fingerprint is None:
+                cursor = self._db.execute("DELETE FROM retrievals")
+            else:
+                cursor = self._db.execute("DELETE FROM retrievals WHERE fingerprint != ?", (keep_fingerprint,))
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self):
+        """Entry count and hit/miss counters"""
+        with self._lock:
+            size = self._db.execute("SELECT COUNT(*) FROM retrievals").fetchone()[0]
+        return {"size": size, "hits": self.hits, "misses": self.misses}
+
+
+def to_records(nodes):
+    """NodeWithScore list -> JSON-serializable dicts"""
+    return [
+        {"id": n.node.node_id, "score": n.score, "text": n.node.get_content(), "metadata": n.node.metadata}
+        for n in nodes
+    ]
+
+
+def from_records(records):
+    """Cached dicts -> NodeWithScore list"""
+    return [
+        NodeWithScore(node=TextNode(id_=r["id"], text=r["text"], metadata=r.get("metadata") or {}), score=r["score"])
+        for r in records
+    ]
+
+
+class CachedRetriever(BaseRetriever):
+    """Wraps an index retriever and serves repeated queries from the RetrievalCache
+
+    fingerprint is a Fingerprint; entries are keyed on its current value.
+    """
+
+    def __init__(self, retriever, cache, fingerprint, top_k, filters=None):
+        super().__init__()
+        self._retriever = retriever
+        self._cache = cache
+        self._fingerprint = fingerprint
+        self._top_k = top_k
+        self._filters = filters
+
+    def _key(self, query_bundle):
+        return self._cache.make_key(self._fingerprint.current(), query_bundle.query_str, self._top_k, self._filters)
+
+    def _retrieve(self, query_bundle):
+        key = self._key(query_bundle)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return from_records(cached)
+        nodes = self._retriever.retrieve(query_bundle)
+        self._cache.put(key, self._fingerprint.value, to_records(nodes))
+        return nodes
+
+    async def _aretrieve(self, query_bundle):
+        key = self._key(query_bundle)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return from_records(cached)
+        nodes = await self._retriever.aretrieve(query_bundle)
+        self._cache.put(key, self._fingerprint.value, to_records(nodes))
+        return nodes
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide retrieval cache"""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = RetrievalCache()
+    return _cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the persistent retrieval cache")
+    parser.add_argument("--clear", action="store_true", help="Delete every cached retrieval")
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.clear:
+        print(f"Deleted {cache.purge()} cached retrievals from {cache.path}")
+    else:
+        print(f"{cache.path}: {cache.stats()['size']} cached retrievals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import json
+import os
+import re
+
+import services
+
+# Model routing: each request type goes to the cheapest model that handles it well - the small
+# model for Q&A and short answers, the large model only for recommendation synthesis (and
+# follow-ups that amount to a new recommendation). Per-route latency and cost are
+# tracked by tracing.py (route label on every trace; meydan_route_* metrics).
+#
+# Override models with MEYDAN_MODEL_SMALL / MEYDAN_MODEL_LARGE, or single routes with
+# MEYDAN_ROUTES='{"qa": "gpt-4o"}'.
+
+SMALL_MODEL = os.getenv("MEYDAN_MODEL_SMALL", "gpt-4o-mini")
+LARGE_MODEL = os.getenv("MEYDAN_MODEL_LARGE", services.DEFAULT_MODEL)
+
+ROUTES = {
+    "synthesis": LARGE_MODEL,     # final activity recommendations (structured JSON)
+    "alternatives": LARGE_MODEL,  # follow-ups asking for other / replacement activities
+    "qa": SMALL_MODEL,            # questions about activities, pricing, regulations
+    "digest": LARGE_MODEL,        # offline Activity Hubs digests (hub_digests.py build)
+}
+ROUTES.update(json.loads(os.getenv("MEYDAN_ROUTES", "{}")))
+
+# Follow-up questions that are really a request for new recommendations
+ALTERNATIVES_PATTERN = re.compile(
+    r"\b(alternative|instead|other activit|different activit|replace|compare|which activit|recommend|suggest)", re.I)
+
+QA_TOP_K = 5
+
+
+def model_for(route):
+    """Model configured for a route (the large model for unknown routes)"""
+    return ROUTES.get(route, LARGE_MODEL)
+
+
+def route_question(question):
+    """Route for a free-text follow-up question"""
+    return "alternatives" if ALTERNATIVES_PATTERN.search(question) else "qa"
+
+
+def get_llm(route):
+    """Shared LLM for a route"""
+    return services.get_llm(model_for(route))
+
+
+def get_query_engine(route, top_k=QA_TOP_K, streaming=True):
+    """Shared query engine answering with the route's model"""
+    return services.get_query_engine(top_k, model=model_for(route), streaming=streaming)
+
+
+def query_tokens(question, context):
+    """Stream the answer to a follow-up question on the model its route selects"""
+    import streaming
+    route = route_question(question)
+    return streaming.query_tokens(get_query_engine(route), context, model=model_for(route), route=route)
+
+
+def stats():
+    """Requests, latency and estimated cost per (route, model) so far"""
+    import tracing
+    return tracing.metrics.route_summary()
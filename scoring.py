@@ -0,0 +1,132 @@
+import numpy as np
+
+# Deterministic persona scoring: ranks candidate activities by correlation, risk rating and
+# third-party approval in one batched NumPy pass, instead of asking the LLM to weigh them in prose.
+
+# (correlation, risk, approval) weights per persona - chatbot.py prompt (app_streamlit.py passes its own)
+PERSONA_WEIGHTS = {
+    "Business": (0.60, 0.25, 0.15),
+    "Residential": (0.20, 0.40, 0.40),
+    # The prompt gives Finance no explicit weights; bank account success depends on activity
+    # risk, so risk is weighted as high as correlation
+    "Finance": (0.40, 0.40, 0.20),
+}
+
+# Minimum correlation relative to the best candidate (BM25 score / top BM25 score); candidates
+# below it rank after every candidate above it. This is not an absolute match quality - for a
+# vague description the best candidate is always 1.0 - it only keeps weak runners-up from
+# outranking close matches on risk or approval.
+MIN_RELATIVE_CORRELATION = {"Business": 0.90, "Residential": 0.70, "Finance": 0.70}
+
+RISK_VALUES = {"low": 1.0, "medium": 0.5, "high": 0.0}
+WHEN_VALUES = {"n/a": 1.0, "post": 0.5, "pre": 0.0}
+
+
+def risk_value(rating):
+    """Low=1, Medium=0.5, High=0 (unknown ratings count as Medium)"""
+    return RISK_VALUES.get(str(rating).strip().lower(), 0.5)
+
+
+def approval_value(activity):
+    """1 for no third-party approval, 0.5 for POST approval, 0 for PRE approval"""
+    if not activity.needs_approval:
+        return 1.0
+    return WHEN_VALUES.get(activity.when.strip().lower(), 0.0)
+
+
+def score_candidates(candidates, persona, weights=None, min_relative_correlation=None):
+    """Score (Activity, correlation) pairs under a persona's weight table
+
+    Correlation scores are normalized to [0, 1] by the best candidate. Returns a
+    float array of weighted scores, one per candidate, and a boolean array telling
+    which candidates are within the persona's minimum relative correlation of the best.
+    """
+    if not candidates:
+        return np.zeros(0), np.zeros(0, dtype=bool)
+
+    weights = np.asarray((weights or PERSONA_WEIGHTS).get(persona, PERSONA_WEIGHTS["Business"]))
+    threshold = (min_relative_correlation or MIN_RELATIVE_CORRELATION).get(persona, 0.0)
+
+    correlation = np.fromiter((score for _, score in candidates), dtype=float, count=len(candidates))
+    top = correlation.max()
+    if top > 0:
+        correlation = correlation / top
+
+    features = np.column_stack([
+        correlation,
+        np.fromiter((risk_value(a.risk_rating) for a, _ in candidates), dtype=float, count=len(candidates)),
+        np.fromiter((approval_value(a) for a, _ in candidates), dtype=float, count=len(candidates)),
+    ])
+    return features @ weights, correlation >= threshold
+
+
+def rank_candidates(candidates, persona, weights=None, min_relative_correlation=None):
+    """Return [(Activity, weighted score)] best first
+
+    Candidates meeting the relative correlation threshold come first, each tier ordered by
+    weighted score.
+    """
+    scores, eligible = score_candidates(candidates, persona, weights, min_relative_correlation)
+    order = np.lexsort((-scores, ~eligible))
+    return [(candidates[i][0], float(scores[i])) for i in order]
+
+
+def format_ranking(ranked):
+    """Render ranked candidates as compact prompt lines"""
+    lines = []
+    for position, (activity, score) in enumerate(ranked, 1):
+        approval = activity.third_party if activity.needs_approval else "N/A"
+        lines.append(
+            f"{position}. {activity.code} | {activity.name} | Group {activity.group} | Risk {activity.risk_rating} "
+            f"| Third Party {approval} | When {activity.when or 'N/A'} | Score {score:.2f}"
+        )
+    return "\n".join(lines)
+
+
+# Bank account success probability matrix (nationality rating x activity rating) from the
+# Finance persona rules; Medium ratings are interpolated bilinearly between the corners
+BANK_PROBABILITY = np.array([
+    #  Low activity, High activity
+    [0.80, 0.60],  # Low nationality
+    [0.50, 0.30],  # High nationality
+])
+
+RATING_POSITIONS = {"low": 0.0, "medium": 0.5, "high": 1.0}
+
+
+def rating_position(rating):
+    """Low=0, Medium=0.5, High=1 on the probability matrix axes (unknown counts as Medium)"""
+    return RATING_POSITIONS.get(str(rating).strip().lower(), 0.5)
+
+
+def bank_account_probability(activity_ratings, nationality_ratings):
+    """Success probability for every activity x nationality pair in one call
+
+    Takes sequences of Low/Medium/High ratings and returns an array of shape
+    (len(activity_ratings), len(nationality_ratings)). Override nationalities get 0.
+    """
+    a = np.fromiter((rating_position(r) for r in activity_ratings), dtype=float)[:, None]
+    n = np.fromiter((rating_position(r) for r in nationality_ratings), dtype=float)[None, :]
+    (ll, lh), (hl, hh) = BANK_PROBABILITY
+    probability = (1 - n) * ((1 - a) * ll + a * lh) + n * ((1 - a) * hl + a * hh)
+    override = np.array([str(r).strip().lower() == "override" for r in nationality_ratings], dtype=bool)
+    probability[:, override] = 0.0
+    return probability
+
+
+def bank_probability_table(activities, country_ratings):
+    """[(Activity, {country: probability})] for activities x resolved nationalities"""
+    if not activities or not country_ratings:
+        return []
+    countries = list(country_ratings)
+    probability = bank_account_probability([a.risk_rating for a in activities], country_ratings.values())
+    return [(activity, dict(zip(countries, row.tolist()))) for activity, row in zip(activities, probability)]
+
+
+def format_bank_probability(table):
+    """Render a bank probability table as compact prompt/report lines"""
+    return "\n".join(
+        f"- {activity.code} {activity.name} ({activity.risk_rating} risk): "
+        + ", ".join(f"{country} {p:.0%}" for country, p in row.items())
+        for activity, row in table
+    )
@@ -0,0 +1,256 @@
+import contextlib
+import json
+import os
+import threading
+
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+import chatbot
+import hub_digests
+import intents
+import router
+import sessions
+import streaming
+import tracing
+
+# Async web backend for templates/index.html: the chatbot.py question flow with per-session
+# state, JSON endpoints (/api/chat, /api/status, /api/reset) and Server-Sent Events streaming
+# (/api/chat/stream). Sessions are held in a sessions.SessionStore with LRU eviction and idle
+# timeout (/api/sessions reports memory use); /metrics exports tracing.py metrics. Blocking
+# LlamaCloud/OpenAI work runs in the thread pool so one process serves many reps at once.
+#
+#   uvicorn server:app --host 0.0.0.0 --port 8000
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "index.html")
+SESSION_COOKIE = "meydan_session"
+
+PERSONA_PROMPT = """Which persona best fits this customer?
+a. Residential (visa/residency focused)
+b. Business (genuine entrepreneur)
+c. Finance (banking/tax optimization)"""
+
+CHAT_HELP = """You can now ask questions about activities, services, pricing or regulations, update any
+customer information (e.g. 'customer now wants 5 visas'), or type 'refresh' to regenerate recommendations."""
+
+
+class SessionBusy(Exception):
+    """A turn arrived while the session's previous turn was still running"""
+
+
+class ChatSession:
+    """One rep's conversation: profile plus position in the question flow"""
+    __slots__ = ("profile", "step", "question", "recommendations", "lock")
+
+    def __init__(self):
+        self.profile = chatbot.new_profile()
+        self.step = "start"  # start -> initial -> persona -> persona_questions -> chat
+        self.question = 0
+        self.recommendations = None
+        self.lock = threading.Lock()  # one turn at a time per session, held by turn()
+
+    def status(self):
+        """Progress as expected by index.html"""
+        answered = self.question if self.step == "initial" else (0 if self.step == "start" else len(chatbot.initial_questions))
+        return {
+            "current_question": answered,
+            "total_questions": len(chatbot.initial_questions),
+            "persona_questions_done": self.step == "chat",
+            "recommendations_generated": self.recommendations is not None,
+        }
+
+    @contextlib.contextmanager
+    def turn(self):
+        """Hold the session for one turn, until its stream is consumed; raises SessionBusy if taken"""
+        if not self.lock.acquire(blocking=False):
+            raise SessionBusy("the previous message is still being answered")
+        try:
+            yield self
+        finally:
+            self.lock.release()
+
+    def handle(self, message):
+        """Advance the question flow (call inside turn())
+
+        Returns ("message", text) for the next question or a short reply, or
+        ("recommendations", stream) / ("answer", stream) with a TimedStream to run.
+        """
+        return self._advance(message.strip())
+
+    def _advance(self, message):
+
+        if self.step == "start":
+            self.step = "initial"
+            return "message", f"Q1: {chatbot.initial_questions[0]}"
+
+        if self.step == "initial":
+            chatbot.record_initial_answer(self.profile, self.question, message)
+            self.question += 1
+            if self.question < len(chatbot.initial_questions):
+                return "message", f"Q{self.question + 1}: {chatbot.initial_questions[self.question]}"
+            self.step = "persona"
+            return "message", f"Q8: {PERSONA_PROMPT}"
+
+        if self.step == "persona":
+            persona = chatbot.select_persona(message)
+            if persona is None:
+                return "message", f"Please select a, b or c.\n{PERSONA_PROMPT}"
+            self.profile['persona'] = persona
+            self.step = "persona_questions"
+            self.question = 0
+            return "message", f"[Persona Identified: {persona}]\nQ1: {chatbot.persona_questions[persona][0]}"
+
+        if self.step == "persona_questions":
+            questions = chatbot.persona_questions[self.profile['persona']]
+            chatbot.record_persona_answer(self.profile, self.question, message)
+            self.question += 1
+            if self.question < len(questions):
+                return "message", f"Q{self.question + 1}: {questions[self.question]}"
+            self.step = "chat"
+            return "recommendations", chatbot.stream_activity_recommendations(self.profile)
+
+        # Interactive conversation
+        intent = intents.classify(message)
+        if intent.kind == "refresh":
+            return "recommendations", chatbot.stream_activity_recommendations(self.profile)
+        if chatbot.apply_intent(self.profile, intent):
+            return "message", "Profile updated! Type 'refresh' to see updated recommendations."
+        return "answer", streaming.TimedStream(
+            router.query_tokens(message, chatbot.qa_context(self.profile, message)), label="Answer")
+
+
+store = sessions.SessionStore(ChatSession)
+
+
+def get_session(request):
+    """(session id, ChatSession) for the request's cookie, creating a new session if needed"""
+    return store.get_or_create(request.cookies.get(SESSION_COOKIE))
+
+
+def with_cookie(response, session_id):
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return response
+
+
+async def index(request):
+    return FileResponse(TEMPLATE_PATH)
+
+
+async def chat(request):
+    """Non-streaming chat: runs the whole turn and returns JSON"""
+    session_id, session = get_session(request)
+    try:
+        message = (await request.json()).get("message", "")
+        with session.turn():
+            kind, result = await run_in_threadpool(session.handle, message)
+            if kind == "message":
+                return with_cookie(JSONResponse({"message": result}), session_id)
+            text = await run_in_threadpool(result.consume)
+            if kind == "recommendations":
+                session.recommendations = text
+                return with_cookie(JSONResponse({"recommendations": text, **recommendation_json(result)}), session_id)
+            return with_cookie(JSONResponse({"message": text}), session_id)
+    except SessionBusy as e:
+        return with_cookie(JSONResponse({"error": str(e)}, status_code=409), session_id)
+    except Exception as e:
+        return with_cookie(JSONResponse({"error": str(e)}, status_code=500), session_id)
+
+
+def recommendation_json(stream):
+    """Structured records of a finished recommendation stream, and the reason when the license is blocked"""
+    result = {"records": [record.to_dict() for record in getattr(stream, "records", None) or []]}
+    if getattr(stream, "blocked", None):
+        result.update(status="blocked", reason=stream.blocked)
+    return result
+
+
+def sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def chat_stream(request):
+    """Streaming chat over Server-Sent Events
+
+    Events: 'message' (a complete reply), 'token' (one chunk of a recommendation or
+    answer), 'done' (final text, timing and, for recommendations, the records or the blocked
+    status and reason), 'error'.
+    """
+    session_id, session = get_session(request)
+    message = (await request.json()).get("message", "")
+
+    async def events():
+        # The session stays held until the last token is sent (or the client disconnects)
+        try:
+            with session.turn():
+                kind, result = await run_in_threadpool(session.handle, message)
+                if kind == "message":
+                    yield sse("message", {"text": result})
+                    return
+                yield sse("start", {"kind": kind})
+                async for token in iterate_in_threadpool(iter(result)):
+                    yield sse("token", {"text": token})
+                if kind == "recommendations":
+                    session.recommendations = result.text
+                done = {"kind": kind, "text": result.text, "timing": result.timing_report()}
+                if kind == "recommendations":
+                    done.update(recommendation_json(result))
+                yield sse("done", done)
+        except Exception as e:
+            yield sse("error", {"error": str(e)})
+
+    response = StreamingResponse(events(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return with_cookie(response, session_id)
+
+
+async def status(request):
+    session_id, session = get_session(request)
+    return with_cookie(JSONResponse(session.status()), session_id)
+
+
+async def reset(request):
+    session_id, _ = get_session(request)
+    store.reset(session_id)
+    return with_cookie(JSONResponse({"status": "reset"}), session_id)
+
+
+async def session_stats(request):
+    """Session count, evictions and memory per session"""
+    return JSONResponse(await run_in_threadpool(store.stats))
+
+
+async def metrics(request):
+    """Prometheus text format: stage latencies, tokens and estimated cost"""
+    return PlainTextResponse(tracing.metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+
+async def traces(request):
+    """Recent recommendation and chat traces with their stage spans"""
+    return JSONResponse([trace.summary() for trace in list(tracing.recent_traces)])
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    hub_digests.get_store()  # pre-warm the Activity Hubs digests before the first request
+    yield
+
+
+app = Starlette(routes=[
+    Route("/", index),
+    Route("/api/chat", chat, methods=["POST"]),
+    Route("/api/chat/stream", chat_stream, methods=["POST"]),
+    Route("/api/status", status),
+    Route("/api/reset", reset, methods=["POST"]),
+    Route("/api/sessions", session_stats),
+    Route("/metrics", metrics),
+    Route("/api/traces", traces),
+], lifespan=lifespan)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+
+# Lazy service layer - the LlamaCloud index and OpenAI LLM are only built on first use,
+# so importing chatbot.py (or any helper in it) never touches the network or llama_index.
+# MEYDAN_BACKEND=record|replay swaps in the recording / offline stand-ins from fakes.py.
+
+INDEX_NAME = "business_activity_intelligence-1759747899"
+DEFAULT_MODEL = "gpt-4o"
+
+_lock = threading.Lock()
+_index = None
+_index_fingerprint = None
+_llms = {}
+_env_loaded = False
+
+# Registry of long-lived retrievers and query engines, built once per process per key
+_registry_lock = threading.RLock()
+_retrievers = {}      # (top_k, filters) -> CachedRetriever
+_query_engines = {}   # (top_k, model, filters, streaming) -> RetrieverQueryEngine
+_registry_stats = {"built": 0, "build_seconds": 0.0, "reused": 0}
+
+
+def load_environment():
+    """Load .env once, on first service access"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def get_index():
+    """Return the shared LlamaCloudIndex, creating it on first call"""
+    global _index, _index_fingerprint
+    if _index is None:
+        with _lock:
+            if _index is None:
+                load_environment()
+                import fakes
+                if fakes.backend() == "replay":
+                    print("[Offline replay backend - no LlamaCloud calls]")
+                    _index = fakes.FakeIndex(fakes.get_recordings(), fakes.get_faults())
+                    return _index
+                import http_pool
+                from llama_cloud_services import LlamaCloudIndex
+                print("Initializing Meydan Free Zone Sales Assistant...")
+                _index = LlamaCloudIndex(
+                    name=INDEX_NAME,
+                    project_name="Default",
+                    organization_id=os.getenv("LLAMA_CLOUD_ORGANIZATION_ID"),
+                    api_key=os.getenv("LLAMA_CLOUD_API_KEY"),
+                    httpx_client=http_pool.get_client(),
+                    async_httpx_client=http_pool.get_async_client(),
+                )
+                if fakes.backend() == "record":
+                    _index = fakes.RecordingIndex(_index, fakes.get_recordings())
+                # Cached retrievals from an older version of the index are no longer valid;
+                # the version is re-checked every RETRIEVAL_FINGERPRINT_TTL seconds
+                import retrieval_cache
+                _index_fingerprint = retrieval_cache.Fingerprint(_index, retrieval_cache.get_cache())
+    return _index
+
+
+def get_llm(model=DEFAULT_MODEL):
+    """Return the shared OpenAI LLM for a model, creating it on first call"""
+    llm = _llms.get(model)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(model)
+            if llm is None:
+                load_environment()
+                import fakes
+                mode = fakes.backend()
+                if mode == "replay":
+                    llm = fakes.FakeLLM(fakes.get_recordings(), fakes.get_faults(), model=model)
+                else:
+                    import http_pool
+                    from llama_index.llms.openai import OpenAI
+                    llm = OpenAI(model=model, temperature=0.1,
+                                 http_client=http_pool.get_client(),
+                                 async_http_client=http_pool.get_async_client())
+                    if mode == "record":
+                        llm = fakes.RecordingLLM(llm, fakes.get_recordings())
+                _llms[model] = llm
+    return llm
+
+
+def _filters_key(filters):
+    """Hashable registry key for optional MetadataFilters"""
+    return None if filters is None else repr(filters)
+
+
+def _registered(registry, key, build):
+    """Return registry[key], building (and timing) it on first request"""
+    with _registry_lock:
+        obj = registry.get(key)
+        if obj is not None:
+            _registry_stats["reused"] += 1
+            return obj
+        start = time.perf_counter()
+        obj = build()
+        _registry_stats["built"] += 1
+        _registry_stats["build_seconds"] += time.perf_counter() - start
+        registry[key] = obj
+        return obj
+
+
+def get_retriever(top_k, filters=None):
+    """Shared index retriever whose results go through the persistent retrieval cache"""
+    def build():
+        import fakes
+        import retrieval_cache
+        index = get_index()
+        retriever = index.as_retriever(similarity_top_k=top_k, filters=filters)
+        if fakes.backend() != "live":
+            # Record every call, and replay with its injected latency; keep the live cache untouched
+            return retriever
+        return retrieval_cache.CachedRetriever(
+            retriever, retrieval_cache.get_cache(), _index_fingerprint, top_k, filters,
+        )
+    return _registered(_retrievers, (top_k, _filters_key(filters)), build)
+
+
+def get_query_engine(top_k, model=DEFAULT_MODEL, filters=None, streaming=False):
+    """Shared query engine over the cached retriever (streaming=True yields tokens via response_gen)"""
+    def build():
+        from llama_index.core.query_engine import RetrieverQueryEngine
+        return RetrieverQueryEngine.from_args(get_retriever(top_k, filters), llm=get_llm(model), streaming=streaming)
+    return _registered(_query_engines, (top_k, model, _filters_key(filters), streaming), build)
+
+
+def registry_stats():
+    """Construction metrics: objects built, total build time, and reuses since start"""
+    with _registry_lock:
+        return {
+            "retrievers": len(_retrievers),
+            "query_engines": len(_query_engines),
+            **_registry_stats,
+        }
+
+
+def reset():
+    """Drop the cached index, LLMs, retrievers and query engines (next access rebuilds them)"""
+    global _index, _index_fingerprint
+    with _lock:
+        _index = None
+        _index_fingerprint = None
+        _llms.clear()
+    with _registry_lock:
+        _retrievers.clear()
+        _query_engines.clear()
@@ -0,0 +1,182 @@
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Multi-session state: compact CustomerProfile records and a thread-safe session store with
+# LRU eviction and idle timeout, so one process can hold many in-flight assessments.
+
+MAX_SESSIONS = int(os.getenv("SESSION_MAX", "5000"))
+IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", "3600"))  # seconds
+
+
+class CustomerProfile:
+    """Customer profile with fixed fields
+
+    Uses __slots__ instead of a per-instance dict, and keeps the dict-style access
+    (profile['persona'], .get, dict(profile)) the chatbot code already relies on.
+    """
+    FIELDS = ("shareholders", "nationalities", "visas_needed", "business_description", "experience",
+              "flexibility", "purpose", "timeline", "persona", "persona_answers")
+    __slots__ = FIELDS
+
+    def __init__(self, **values):
+        for field in self.FIELDS:
+            setattr(self, field, None)
+        self.nationalities = []
+        self.persona_answers = {}
+        for field, value in values.items():
+            self[field] = value
+
+    def __getitem__(self, field):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __setitem__(self, field, value):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        setattr(self, field, value)
+
+    def __contains__(self, field):
+        return field in self.FIELDS
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def get(self, field, default=None):
+        return getattr(self, field) if field in self.FIELDS else default
+
+    def keys(self):
+        return self.FIELDS
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in self.FIELDS]
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+def memory_usage(obj, _seen=None):
+    """Approximate deep size in bytes of an object and everything it references"""
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(memory_usage(k, seen) + memory_usage(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(memory_usage(v, seen) for v in obj)
+    elif not isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        for name in getattr(type(obj), "__slots__", ()):
+            if hasattr(obj, name):
+                size += memory_usage(getattr(obj, name), seen)
+        if hasattr(obj, "__dict__"):
+            size += memory_usage(vars(obj), seen)
+    return size
+
+
+class SessionStore:
+    """Thread-safe session id -> state map with LRU eviction and idle timeout
+
+    factory builds the state for a new session. A session idle for longer than
+    idle_timeout is dropped on its next lookup or by purge(); once max_size sessions
+    are held, the least recently used one is evicted.
+    """
+
+    def __init__(self, factory, max_size=MAX_SESSIONS, idle_timeout=IDLE_TIMEOUT, clock=time.monotonic):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._sessions = OrderedDict()  # session id -> (last_used, state)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, session_id):
+        """State for session_id, or None if unknown or idle too long"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            now = self.clock()
+            if now - entry[0] > self.idle_timeout:
+                del self._sessions[session_id]
+                self.expirations += 1
+                return None
+            self._sessions[session_id] = (now, entry[1])
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def create(self):
+        """Start a new session; returns (session id, state)"""
+        session_id = secrets.token_urlsafe(16)
+        state = self.factory()
+        with self._lock:
+            self._sessions[session_id] = (self.clock(), state)
+            self.created += 1
+            while len(self._sessions) > self.max_size:
+                self._sessions.popitem(last=False)
+                self.evictions += 1
+        return session_id, state
+
+    def get_or_create(self, session_id):
+        """(session id, state) for an existing session, or a new one"""
+        state = self.get(session_id) if session_id else None
+        if state is None:
+            return self.create()
+        return session_id, state
+
+    def reset(self, session_id):
+        """Replace a session's state with a fresh one, keeping its id"""
+        state = self.factory()
+        with self._lock:
+            self._sessions[session_id] = (self.clock(), state)
+            self._sessions.move_to_end(session_id)
+        return state
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def purge(self):
+        """Drop every idle session; returns how many were removed"""
+        with self._lock:
+            cutoff = self.clock() - self.idle_timeout
+            expired = [sid for sid, (last_used, _) in self._sessions.items() if last_used < cutoff]
+            for sid in expired:
+                del self._sessions[sid]
+            self.expirations += len(expired)
+            return len(expired)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        """Session counts and memory per session, for capacity planning"""
+        with self._lock:
+            states = [state for _, state in self._sessions.values()]
+            counters = {
+                "sessions": len(states),
+                "max_size": self.max_size,
+                "idle_timeout": self.idle_timeout,
+                "created": self.created,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+        sizes = [memory_usage(state) for state in states]
+        counters["memory_bytes"] = sum(sizes)
+        counters["bytes_per_session"] = sum(sizes) / len(sizes) if sizes else 0
+        counters["max_session_bytes"] = max(sizes, default=0)
+        return counters
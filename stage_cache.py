@@ -0,0 +1,182 @@
+import os
+import threading
+
+import recommendation_cache
+
+# Field-to-stage dependency graph for incremental refresh. Each recommendation stage lists the
+# profile fields it reads; its output is cached under a hash of only those fields, so a refresh
+# after update_field recomputes just the stages whose inputs changed (e.g. a new visa count or
+# timeline re-runs synthesis but reuses the country check, scoring and retrieval).
+#
+# Stages reading only WARM_FIELDS give the same output for every customer with that business
+# description and persona: warm_cache.py pre-computes them for common descriptions into the
+# persistent warm store (recommendation_cache.WarmStore), shared by every process, so a new
+# customer with a common description only waits for synthesis.
+
+STAGE_CACHE_SIZE = int(os.getenv("STAGE_CACHE_SIZE", "64"))
+
+# Stages in pipeline order; None means the stage reads the whole profile
+STAGE_FIELDS = {
+    "country_check": ("persona", "nationalities"),
+    "scoring": ("persona", "business_description"),
+    "retrieval": ("persona", "business_description"),
+    "synthesis": None,  # every field appears in the prompt; cached by recommendation_cache
+}
+
+# Extra inputs for one persona: Finance scoring adds the bank probability matrix, and Finance
+# retrieval queries Country Risk for unresolved nationalities
+PERSONA_STAGE_FIELDS = {
+    "Finance": {"scoring": ("nationalities",), "retrieval": ("nationalities",)},
+}
+
+WARM_FIELDS = ("persona", "business_description")
+
+
+def stage_fields(stage, persona=None):
+    """Profile fields a stage reads for a persona (None for the whole profile)"""
+    fields = STAGE_FIELDS[stage]
+    if fields is None:
+        return None
+    return fields + PERSONA_STAGE_FIELDS.get(persona, {}).get(stage, ())
+
+
+def warmable(stage, persona=None):
+    """True if a stage's output depends only on the persona and business description"""
+    fields = stage_fields(stage, persona)
+    return fields is not None and set(fields) <= set(WARM_FIELDS)
+
+
+def warm_stages(persona=None):
+    """Stages the warm store holds for a persona, in pipeline order"""
+    return [stage for stage in STAGE_FIELDS if warmable(stage, persona)]
+
+
+def encode(stage, value):
+    """JSON-serializable form of a stage output, for the warm store"""
+    if stage == "retrieval":
+        import retrieval_cache
+        nodes, timings = value
+        return {"nodes": retrieval_cache.to_records(nodes), "timings": timings}
+    return value
+
+
+def decode(stage, value):
+    """Stage output from its warm store form"""
+    if stage == "retrieval":
+        import retrieval_cache
+        return retrieval_cache.from_records(value["nodes"]), value["timings"]
+    return value
+
+
+def stage_inputs(stage, profile):
+    """The part of the profile a stage depends on"""
+    fields = stage_fields(stage, profile.get("persona"))
+    if fields is None:
+        return dict(profile)
+    return {field: profile.get(field) for field in fields}
+
+
+def stage_key(stage, profile, variant=""):
+    """Cache key for a stage: hash of its input fields, the stage name and a variant tag"""
+    return recommendation_cache.profile_key(stage_inputs(stage, profile), variant=f"{variant}:{stage}")
+
+
+def stages_for(fields, persona=None):
+    """Stages that must be recomputed for a persona when any of `fields` changes, in pipeline order"""
+    fields = set(fields)
+    needs = {stage: stage_fields(stage, persona) for stage in STAGE_FIELDS}
+    return [stage for stage, inputs in needs.items() if inputs is None or fields.intersection(inputs)]
+
+
+def changed_fields(before, after):
+    """Profile fields whose normalized value differs between two profiles"""
+    normalize = recommendation_cache.normalize
+    return [field for field in dict(after)
+            if normalize(before.get(field)) != normalize(after.get(field))]
+
+
+class StageCache:
+    """Outputs of individual pipeline stages, keyed by the fields each stage depends on"""
+
+    def __init__(self, max_size=STAGE_CACHE_SIZE, ttl=recommendation_cache.CACHE_TTL):
+        self._cache = recommendation_cache.RecommendationCache(max_size=max_size, ttl=ttl)
+
+    def get_or_compute(self, stage, profile, compute, variant="", warm=None, fill=False):
+        """(output, source): the cached output for unchanged inputs, else compute() and store it
+
+        source is "memory" or "warm" for a reused output, None when compute() ran. warm is a
+        WarmStore read for warmable stages; with fill, they are recomputed and written to it.
+        """
+        key = stage_key(stage, profile, variant)
+        value = None if fill else self._cache.get(key)
+        if value is not None:
+            return value, "memory"
+        shared = warm is not None and warmable(stage, profile.get("persona"))
+        if shared and not fill:
+            stored = warm.get(key)
+            if stored is not None:
+                value = decode(stage, stored)
+                self._cache.put(key, value)
+                return value, "warm"
+        value = compute()
+        self._cache.put(key, value)
+        if shared and fill:
+            warm.put(key, encode(stage, value), profile.get("business_description") or "", profile.get("persona") or "")
+        return value, None
+
+    def invalidate(self):
+        self._cache.invalidate()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide stage cache"""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = StageCache()
+    return _cache
+
+
+class StageRunner:
+    """Runs the cacheable stages of one recommendation, recording which were reused
+
+    warm is the WarmStore to read pre-warmed stages from (None to skip it); fill recomputes
+    the warmable stages and writes them to it instead.
+    """
+
+    def __init__(self, profile, variant="", cache=None, warm=None, fill=False):
+        self.profile = profile
+        self.variant = variant
+        self.cache = cache or get_cache()
+        self.warm = warm
+        self.fill = fill
+        self.reused = []
+        self.warmed = []
+
+    def run(self, stage, span, compute):
+        """Stage output, recomputed only when its input fields changed; sets span["reused"]"""
+        value, source = self.cache.get_or_compute(stage, self.profile, compute, variant=self.variant,
+                                                  warm=self.warm, fill=self.fill)
+        span["reused"] = source is not None
+        if self.warm is not None and warmable(stage, self.profile.get("persona")):
+            span["warm_hit"] = source == "warm"
+        if source == "memory":
+            self.reused.append(stage)
+        elif source == "warm":
+            self.warmed.append(stage)
+        return value
+
+    def report(self):
+        """Print the stages reused so far, if any"""
+        if self.reused:
+            print(f"[Reusing unchanged stages: {', '.join(self.reused)}]")
+        if self.warmed:
+            print(f"[Using pre-warmed stages: {', '.join(self.warmed)}]")
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import deque
+
+# Token streaming helpers: wrap a token generator, measure time-to-first-token (TTFT)
+# and total generation time, and keep recent timings for reporting.
+
+recent_timings = deque(maxlen=200)  # (label, ttft seconds, total seconds, characters)
+_lock = threading.Lock()
+
+
+class TimedStream:
+    """Iterable over generated tokens that records TTFT and total time
+
+    The clock starts when iteration starts, so retrieval done inside the token
+    generator counts towards time-to-first-token. After iteration, .text holds the
+    full answer (passed through finalize, if given).
+    """
+
+    def __init__(self, tokens, label="Answer", finalize=None, usage=None):
+        self.tokens = tokens
+        self.label = label
+        self.finalize = finalize
+        self.usage = usage if usage is not None else {}
+        self.text = None
+        self.ttft = None
+        self.total = None
+
+    def __iter__(self):
+        chunks = []
+        start = time.perf_counter()
+        for token in self.tokens:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - start
+            chunks.append(token)
+            yield token
+        self.total = time.perf_counter() - start
+        if self.ttft is None:
+            self.ttft = self.total
+        text = "".join(chunks)
+        self.text = self.finalize(text) if self.finalize else text
+        with _lock:
+            recent_timings.append((self.label, self.ttft, self.total, len(text)))
+
+    def consume(self):
+        """Drain the stream without displaying it and return the final text"""
+        for _ in self:
+            pass
+        return self.text
+
+    def timing_report(self):
+        """One-line TTFT / total time summary"""
+        if self.total is None:
+            return f"[{self.label}: in progress]"
+        report = f"{self.label}: first token after {self.ttft:.2f}s, complete in {self.total:.2f}s"
+        if self.usage.get("prompt_tokens") is not None:
+            report += f", {self.usage['prompt_tokens']:,} prompt / {self.usage.get('completion_tokens') or 0:,} completion tokens"
+        return f"[{report}]"
+
+
+def query_tokens(query_engine, query, model=None, route=None):
+    """Run a streaming query engine lazily, yielding answer tokens
+
+    The turn is traced as kind "chat": retrieval (query() returns once nodes are retrieved
+    and synthesis has started), time to first token, generation, and estimated tokens.
+    """
+    import prompt_builder
+    import tracing
+    trace = tracing.Trace("chat", model=model, route=route)
+    try:
+        with trace.span("retrieval") as span:
+            response = query_engine.query(query)
+            span["nodes"] = len(response.source_nodes)
+        chunks = []
+        with trace.span("llm"):
+            for token in tracing.first_token(trace, response.response_gen):
+                chunks.append(token)
+                yield token
+        prompt_tokens = prompt_builder.count_tokens(query) + sum(
+            prompt_builder.count_tokens(n.node.get_content()) for n in response.source_nodes)
+        trace.set(nodes=len(response.source_nodes), prompt_tokens=prompt_tokens,
+                  completion_tokens=prompt_builder.count_tokens("".join(chunks)))
+        trace.finish()
+    except Exception:
+        trace.finish("error")
+        raise
+
+
+def print_stream(stream):
+    """Print tokens as they arrive (CLI) and return the final text"""
+    for token in stream:
+        print(token, end="", flush=True)
+    print()
+    print(stream.timing_report())
+    return stream.text
+
+
+def timing_summary(label=None):
+    """Median and worst TTFT / total time over recent streams"""
+    with _lock:
+        rows = [r for r in recent_timings if label is None or r[0] == label]
+    if not rows:
+        return None
+    ttfts = sorted(r[1] for r in rows)
+    totals = sorted(r[2] for r in rows)
+    return {
+        "count": len(rows),
+        "ttft_p50": ttfts[len(ttfts) // 2],
+        "ttft_max": ttfts[-1],
+        "total_p50": totals[len(totals) // 2],
+        "total_max": totals[-1],
+    }
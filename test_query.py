@@ -1,35 +1,55 @@
 
 
 import os
+import time
 from dotenv import load_dotenv
 from llama_cloud_services import LlamaCloudIndex
 from llama_index.llms.openai import OpenAI
+import bm25
+import fakes
 
 # Load environment variables
 load_dotenv()
 
-print("🔄 Initializing connection to LlamaCloud...")
+# Test query
+test_query = "I want to start a printing business in Dubai"
+
+# Local BM25 search over the activity catalogue - no network call
+print(f"📝 Query: {test_query}\n")
+print("🔍 Searching local activity catalogue (BM25)...\n")
+start = time.perf_counter()
+local_matches = bm25.get_retriever().retrieve(test_query, top_k=3)
+print(f"TOP 3 LOCAL MATCHES ({(time.perf_counter() - start) * 1000:.2f} ms)")
+print(bm25.format_matches(local_matches) or "(catalogue not available)")
+print()
+
+backend = fakes.backend()  # MEYDAN_BACKEND=replay runs this test offline from recordings
+print("🔄 Initializing connection to LlamaCloud..." if backend != "replay" else "🔄 Using offline replay backend...")
 
 # Initialize LlamaCloud Index
-try:
-    index = LlamaCloudIndex(
-        name="business_activities_index",
-        project_name="Default",
-        organization_id=os.getenv("LLAMA_CLOUD_ORGANIZATION_ID"),
-        api_key=os.getenv("LLAMA_CLOUD_API_KEY"),
-    )
-    print("✅ Connected to LlamaCloud index successfully!\n")
-except Exception as e:
-    print(f"❌ Error connecting to LlamaCloud: {e}")
-    exit()
+if backend == "replay":
+    index = fakes.FakeIndex(fakes.get_recordings(), fakes.get_faults())
+    llm = fakes.FakeLLM(fakes.get_recordings(), fakes.get_faults(), model="gpt-4o-mini")
+else:
+    try:
+        index = LlamaCloudIndex(
+            name="business_activities_index",
+            project_name="Default",
+            organization_id=os.getenv("LLAMA_CLOUD_ORGANIZATION_ID"),
+            api_key=os.getenv("LLAMA_CLOUD_API_KEY"),
+        )
+        print("✅ Connected to LlamaCloud index successfully!\n")
+    except Exception as e:
+        print(f"❌ Error connecting to LlamaCloud: {e}")
+        exit()
 
-# Initialize OpenAI
-os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
-llm = OpenAI(model="gpt-4o-mini", temperature=0.1)
+    # Initialize OpenAI
+    os.environ["OPENAI_API_KEY"] = os.getenv("OPENAI_API_KEY")
+    llm = OpenAI(model="gpt-4o-mini", temperature=0.1)
+    if backend == "record":
+        index = fakes.RecordingIndex(index, fakes.get_recordings())
+        llm = fakes.RecordingLLM(llm, fakes.get_recordings())
 
-# Test query
-test_query = "I want to start a printing business in Dubai"
-print(f"📝 Query: {test_query}\n")
 print("🔍 Searching business activities database...\n")
 
 try:
@@ -0,0 +1,302 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Per-stage tracing for recommendation and chat turns: stage spans, node counts, token usage
+# and estimated cost. Aggregates are exported in Prometheus text format (server.py /metrics,
+# or a standalone endpoint on MEYDAN_METRICS_PORT); with MEYDAN_OTEL=1 and the
+# opentelemetry package installed, spans are also emitted through OpenTelemetry.
+
+# USD per 1M tokens (input, output); override with MEYDAN_MODEL_PRICES='{"gpt-4o": [2.5, 10]}'
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+MODEL_PRICES.update({k: tuple(v) for k, v in json.loads(os.getenv("MEYDAN_MODEL_PRICES", "{}")).items()})
+
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)  # seconds
+
+recent_traces = deque(maxlen=100)
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost of one LLM call (0 for unknown models)"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        # Dated model names, e.g. gpt-4o-2024-08-06
+        prices = next((p for name, p in sorted(MODEL_PRICES.items(), key=lambda kv: -len(kv[0]))
+                       if model and model.startswith(name)), (0.0, 0.0))
+    return ((prompt_tokens or 0) * prices[0] + (completion_tokens or 0) * prices[1]) / 1_000_000
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram"""
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """Thread-safe aggregates of finished traces"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = defaultdict(Histogram)    # (kind, stage) -> Histogram
+        self.request_seconds = defaultdict(Histogram)  # kind -> Histogram
+        self.requests = defaultdict(int)               # (kind, status) -> count
+        self.tokens = defaultdict(int)                 # (kind, model, type) -> count
+        self.cost = defaultdict(float)                 # (kind, model) -> USD
+        self.nodes = defaultdict(int)                  # kind -> retrieved nodes
+        self.route_seconds = defaultdict(Histogram)    # (route, model) -> Histogram
+        self.route_cost = defaultdict(float)           # (route, model) -> USD
+
+    def observe_stage(self, kind, stage, seconds):
+        with self._lock:
+            self.stage_seconds[(kind, stage)].observe(seconds)
+
+    def record(self, trace):
+        model = trace.attributes.get("model") or "unknown"
+        with self._lock:
+            self.request_seconds[trace.kind].observe(trace.total)
+            self.requests[(trace.kind, trace.status)] += 1
+            self.tokens[(trace.kind, model, "prompt")] += trace.attributes.get("prompt_tokens") or 0
+            self.tokens[(trace.kind, model, "completion")] += trace.attributes.get("completion_tokens") or 0
+            self.cost[(trace.kind, model)] += trace.attributes.get("cost_usd", 0.0)
+            self.nodes[trace.kind] += trace.attributes.get("nodes") or 0
+            route = trace.attributes.get("route")
+            if route:
+                self.route_seconds[(route, model)].observe(trace.total)
+                self.route_cost[(route, model)] += trace.attributes.get("cost_usd", 0.0)
+
+    def totals(self):
+        """Process-wide request, token and cost totals"""
+        with self._lock:
+            return {
+                "requests": sum(self.requests.values()),
+                "prompt_tokens": sum(v for k, v in self.tokens.items() if k[2] == "prompt"),
+                "completion_tokens": sum(v for k, v in self.tokens.items() if k[2] == "completion"),
+                "cost_usd": sum(self.cost.values()),
+            }
+
+    def route_summary(self):
+        """Requests, mean latency and cost per model route"""
+        with self._lock:
+            return {
+                f"{route}:{model}": {
+                    "route": route,
+                    "model": model,
+                    "requests": h.count,
+                    "mean_seconds": h.sum / h.count if h.count else 0.0,
+                    "cost_usd": self.route_cost[(route, model)],
+                }
+                for (route, model), h in sorted(self.route_seconds.items())
+            }
+
+    def prometheus_text(self):
+        """Exposition format for Prometheus or an OpenTelemetry collector's prometheus receiver"""
+        lines = []
+
+        def histogram(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in series:
+                for bound, count in zip(BUCKETS, h.counts):
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+                lines.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+                lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+        def counter(name, help_text, series):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in series:
+                lines.append(f"{name}{{{labels}}} {value}")
+
+        with self._lock:
+            histogram("meydan_stage_seconds", "Duration of each pipeline stage",
+                      [(f'kind="{k}",stage="{s}"', h) for (k, s), h in sorted(self.stage_seconds.items())])
+            histogram("meydan_request_seconds", "End-to-end duration of a recommendation or chat turn",
+                      [(f'kind="{k}"', h) for k, h in sorted(self.request_seconds.items())])
+            counter("meydan_requests_total", "Finished turns by status",
+                    [(f'kind="{k}",status="{s}"', v) for (k, s), v in sorted(self.requests.items())])
+            counter("meydan_tokens_total", "LLM tokens by type",
+                    [(f'kind="{k}",model="{m}",type="{t}"', v) for (k, m, t), v in sorted(self.tokens.items())])
+            counter("meydan_cost_usd_total", "Estimated LLM cost in USD",
+                    [(f'kind="{k}",model="{m}"', f"{v:.6f}") for (k, m), v in sorted(self.cost.items())])
+            histogram("meydan_route_seconds", "End-to-end duration per model route",
+                      [(f'route="{r}",model="{m}"', h) for (r, m), h in sorted(self.route_seconds.items())])
+            counter("meydan_route_cost_usd_total", "Estimated LLM cost in USD per model route",
+                    [(f'route="{r}",model="{m}"', f"{v:.6f}") for (r, m), v in sorted(self.route_cost.items())])
+            counter("meydan_nodes_retrieved_total", "Knowledge base nodes retrieved",
+                    [(f'kind="{k}"', v) for k, v in sorted(self.nodes.items())])
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+_otel = None
+
+
+def _otel_tracer():
+    """OpenTelemetry tracer when MEYDAN_OTEL=1 and opentelemetry is installed, else None"""
+    global _otel
+    if _otel is None:
+        _otel = False
+        if os.getenv("MEYDAN_OTEL") == "1":
+            try:
+                from opentelemetry import trace
+                _otel = trace.get_tracer("meydan")
+            except ImportError:
+                pass
+    return _otel or None
+
+
+class Trace:
+    """Stage spans and attributes for one recommendation or chat turn"""
+
+    def __init__(self, kind, **attributes):
+        self.kind = kind
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        self.spans = []  # (stage, offset seconds, duration seconds, attributes)
+        self.status = None
+        self.total = None
+        self._start = time.perf_counter()
+        self._started_at = time.time()
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        """Time a stage; the yielded dict can be filled with attributes (node counts, tokens)"""
+        tracer = _otel_tracer()
+        otel_span = tracer.start_span(f"{self.kind}.{stage}") if tracer else None
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            self.observe(stage, time.perf_counter() - start, offset=start - self._start, **attributes)
+            if otel_span is not None:
+                for key, value in attributes.items():
+                    otel_span.set_attribute(key, value)
+                otel_span.end()
+
+    def observe(self, stage, seconds, offset=None, **attributes):
+        """Record a stage measured elsewhere (e.g. time to first token)"""
+        if offset is None:
+            offset = time.perf_counter() - self._start - seconds
+        self.spans.append((stage, offset, seconds, attributes))
+        metrics.observe_stage(self.kind, stage, seconds)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def finish(self, status="ok"):
+        """Close the trace and add it to the metrics (only the first call counts)"""
+        if self.status is not None:
+            return
+        self.status = status
+        self.total = time.perf_counter() - self._start
+        a = self.attributes
+        if a.get("prompt_tokens") is not None or a.get("completion_tokens") is not None:
+            a["cost_usd"] = estimate_cost(a.get("model"), a.get("prompt_tokens"), a.get("completion_tokens"))
+        recent_traces.append(self)
+        metrics.record(self)
+
+    def summary(self):
+        """Plain dict for logs, JSON and the Streamlit sidebar"""
+        return {
+            "trace_id": self.trace_id,
+            "kind": self.kind,
+            "status": self.status,
+            "started_at": self._started_at,
+            "total_seconds": self.total,
+            "attributes": dict(self.attributes),
+            "spans": [{"stage": s, "offset": o, "seconds": d, **a} for s, o, d, a in self.spans],
+        }
+
+    def report(self):
+        """One-line stage breakdown"""
+        stages = ", ".join(f"{s} {d * 1000:.0f} ms" for s, _, d, _ in self.spans)
+        cost = self.attributes.get("cost_usd")
+        extra = f", ~${cost:.4f}" if cost else ""
+        total = f"{self.total:.2f}s" if self.total is not None else "in progress"
+        return f"[{self.kind} {total}: {stages}{extra}]"
+
+
+def first_token(trace, tokens):
+    """Pass tokens through, recording time to the first one as a 'first_token' stage"""
+    start = time.perf_counter()
+    first = True
+    for token in tokens:
+        if first:
+            trace.observe("first_token", time.perf_counter() - start)
+            first = False
+        yield token
+
+
+def last_trace(kind=None):
+    for trace in reversed(recent_traces):
+        if kind is None or trace.kind == kind:
+            return trace
+    return None
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /traces (recent traces as JSON) in a background thread"""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.prometheus_text().encode(), "text/plain; version=0.0.4"
+                elif self.path == "/traces":
+                    body, content_type = json.dumps([t.summary() for t in list(recent_traces)]).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        _server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+def serve_from_env():
+    """Start the metrics endpoint if MEYDAN_METRICS_PORT is set (CLI and Streamlit processes)"""
+    port = os.getenv("MEYDAN_METRICS_PORT")
+    if port:
+        try:
+            start_metrics_server(int(port), os.getenv("MEYDAN_METRICS_HOST", "127.0.0.1"))
+        except OSError as e:
+            print(f"[Metrics endpoint not started on port {port}: {e}]")
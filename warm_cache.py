@@ -0,0 +1,130 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import batch
+import chatbot
+import recommendation_cache
+import stage_cache
+
+# Pre-warms the pipeline stages that depend only on the business description and persona
+# (stage_cache.WARM_FIELDS: the pre-ranked candidates and the knowledge base retrieval, with
+# the Activity Hubs digest match deciding whether hubs are retrieved) for the descriptions
+# walk-ins ask about most, for each persona in recommendation_cache.WARM_PERSONAS, into the
+# persistent warm store. Any customer whose description and persona match a warmed pair -
+# whatever their shareholders, visas, timeline or other answers - then skips retrieval and
+# scoring; only the final LLM answer runs for their profile. Descriptions are compared
+# normalized (case and spacing); a Business answer to the business model question is appended
+# to the description (chatbot.record_persona_answer), so those chats only match if warmed with
+# it. Runs in parallel under the same requests-per-minute limit and retry policy as batch.py;
+# pairs that are already warm are skipped unless --force is given.
+#
+# The warm store serves the CLI (chatbot.py), the web server and batch.py, which share the
+# "chatbot" prompt variant. app_streamlit.py retrieves with its own top_k and weights and does
+# not read the warm store.
+#
+#   python warm_cache.py --workers 4 --rpm 30
+#   python warm_cache.py --descriptions common.txt --personas Business --force
+
+DESCRIPTIONS = [
+    "e-commerce online store",
+    "general trading",
+    "IT consultancy",
+    "management consultancy",
+    "advertising and marketing agency",
+    "holding company",
+    "real estate brokerage",
+    "software development",
+    "event management",
+    "food and beverage trading",
+    "travel agency",
+    "social media influencer",
+]
+
+WORKERS = int(os.getenv("WARM_WORKERS", str(batch.WORKERS)))
+REQUESTS_PER_MINUTE = float(os.getenv("WARM_RPM", str(batch.REQUESTS_PER_MINUTE)))
+
+
+def read_descriptions(path=None):
+    """Business descriptions to warm: lines of a file, or DESCRIPTIONS"""
+    if not path:
+        return list(DESCRIPTIONS)
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def warm_pairs(descriptions, personas=recommendation_cache.WARM_PERSONAS):
+    """(description, persona) pairs to warm, skipping personas the warm store never serves"""
+    return [(description, persona) for description in descriptions for persona in personas
+            if persona in recommendation_cache.WARM_PERSONAS]
+
+
+def warm_keys(profile):
+    """Warm store keys of a profile's description x persona stages"""
+    return [stage_cache.stage_key(stage, profile, chatbot.CHATBOT.name)
+            for stage in stage_cache.warm_stages(profile['persona'])]
+
+
+def warm_one(profile, store=None):
+    """Compute and store the warmable stages of a profile; returns the retrieved node count"""
+    nodes = chatbot.warm_stages(profile, store=store or recommendation_cache.get_warm_store())
+    if not nodes:
+        raise ValueError("no knowledge base nodes retrieved")
+    return len(nodes)
+
+
+def run(pairs, workers=WORKERS, rpm=REQUESTS_PER_MINUTE, max_retries=batch.MAX_RETRIES, force=False):
+    """Warm every pair; returns {"ok", "error", "skipped"} counts"""
+    store = recommendation_cache.get_warm_store()
+    limiter = batch.RateLimiter(rpm, burst=workers)
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    leads = []
+    for description, persona in pairs:
+        lead = {"id": f"{persona}: {description}", "business_description": description, "persona": persona}
+        if not force and all(store.fresh(key) for key in warm_keys(batch.build_profile(lead))):
+            counts["skipped"] += 1
+            continue
+        leads.append(lead)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(batch.process, lead, limiter, max_retries,
+                               lambda profile: warm_one(profile, store)) for lead in leads]
+        for future in futures:
+            record = future.result()
+            counts[record["status"]] += 1
+            error = f" - {record['error']}" if record["status"] == "error" else ""
+            print(f"[{record['status'].upper()}] {record['id']} ({record['seconds']}s){error}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-warm candidate ranking and retrieval for common business descriptions")
+    parser.add_argument("--descriptions", help="File with one business description per line (default: built-in list)")
+    parser.add_argument("--personas", default=",".join(recommendation_cache.WARM_PERSONAS),
+                        help="Comma-separated personas to warm")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent recommendations")
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="Max requests per minute (0 = unlimited)")
+    parser.add_argument("--max-retries", type=int, default=batch.MAX_RETRIES, help="Retries per pair on rate-limit errors")
+    parser.add_argument("--force", action="store_true", help="Regenerate pairs that are already warm")
+    parser.add_argument("--clear", action="store_true", help="Delete every warmed entry and exit")
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"[Deleted {recommendation_cache.get_warm_store().clear()} warmed stage outputs]")
+        return
+
+    personas = [p.strip() for p in args.personas.split(",") if p.strip()]
+    skipped = [p for p in personas if p not in recommendation_cache.WARM_PERSONAS]
+    if skipped:
+        print(f"[Not warming {', '.join(skipped)}: scoring and retrieval depend on nationalities]")
+    pairs = warm_pairs(read_descriptions(args.descriptions), personas)
+
+    start = time.perf_counter()
+    counts = run(pairs, workers=args.workers, rpm=args.rpm, max_retries=args.max_retries, force=args.force)
+    print(f"\n[Warmed {counts['ok']} of {len(pairs)} pairs in {time.perf_counter() - start:.1f}s: "
+          f"{counts['error']} errors, {counts['skipped']} already warm] -> {recommendation_cache.WARM_PATH}")
+
+
+if __name__ == "__main__":
+    main()